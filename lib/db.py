@@ -1,27 +1,250 @@
 from __future__ import annotations
+import atexit
 import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
 from pathlib import Path
-from typing import Tuple, List
+from typing import Tuple, List, Iterable, Iterator
+
+
+# Tamanho padrão do mapeamento em memória do arquivo do banco (256 MB).
+DEFAULT_MMAP_SIZE = 256 * 1024 * 1024
+
+# PRAGMAs usados por `DBManager.fast_ingest` durante importações em lote:
+# sem fsync a cada commit e com cache maior (64 MiB) para os índices.
+INGEST_PRAGMAS = {"synchronous": "OFF", "cache_size": -65536, "temp_store": "MEMORY"}
+
+# Caminho absoluto da extensão `csv` do SQLite usada por `DBManager.import_csv_native`
+# (ex.: "/usr/lib/sqlite3/csv.so"). Sem ele, a importação nativa não é tentada.
+CSV_EXTENSION_PATH: str | None = None
 
 
 class DBManager:
-    def __init__(self, db_path: str | Path):
+    # Comandos SQL usados pelos métodos abaixo.
+    _SQL_INSERT = "INSERT OR IGNORE INTO livros (titulo, autor, ano_publicacao, preco) VALUES (?, ?, ?, ?)"
+    _SQL_SELECT_ALL = "SELECT id, titulo, autor, ano_publicacao, preco FROM livros ORDER BY id"
+    _SQL_COUNT = "SELECT count(*) FROM livros"
+    _SQL_UPDATE_PRICE = "UPDATE livros SET preco = ? WHERE id = ?"
+    _SQL_DELETE = "DELETE FROM livros WHERE id = ?"
+    _SQL_FIND_BY_AUTHOR = (
+        "SELECT id, titulo, autor, ano_publicacao, preco "
+        "FROM livros WHERE autor LIKE ? ORDER BY id"
+    )
+
+    # Importação nativa (`import_csv_native`): a tabela virtual `temp.livros_csv`
+    # (extensão `csv` do SQLite) é lida e inserida pelo próprio SQLite. Os filtros
+    # aceitam só linhas que os validadores também aceitariam e gravariam iguais:
+    # espaços, tabs e quebras de linha nas pontas são removidos, como no
+    # `strip` do Python, e preços com mais de 2 casas decimais ficam de fora
+    # (o arredondamento do SQLite difere do `round` do Python). Formatos
+    # exóticos, como preço em notação científica, também não são aceitos.
+    # Antes de inserir, uma contagem verifica se alguma linha seria rejeitada.
+    _SQL_CSV_VTAB_TRIMMED = """
+        SELECT trim(titulo, ' ' || char(9, 10, 11, 12, 13)) AS t,
+               trim(autor, ' ' || char(9, 10, 11, 12, 13)) AS a,
+               trim(ano_publicacao, ' ' || char(9, 10, 11, 12, 13)) AS y,
+               replace(trim(preco, ' ' || char(9, 10, 11, 12, 13)), ' ', '') AS p
+        FROM temp.livros_csv
+    """
+    _SQL_CSV_VTAB_VALID = """
+        length(t) BETWEEN 1 AND 200 AND t GLOB '*[A-Za-z0-9À-ÿ]*'
+        AND length(a) BETWEEN 1 AND 200 AND a GLOB '*[A-Za-z0-9À-ÿ]*'
+        AND y GLOB '[0-9]*' AND y NOT GLOB '*[^0-9]*'
+        AND CAST(y AS INTEGER) BETWEEN 1400 AND ?
+        AND p GLOB '*[0-9]*' AND p NOT GLOB '*[^0-9.,]*' AND p NOT GLOB '*[.,]*[.,]*'
+        AND p NOT GLOB '*[.,][0-9][0-9][0-9]*'
+        AND CAST(replace(p, ',', '.') AS REAL) <= 1000000
+    """
+    _SQL_CSV_VTAB_COUNT = (
+        f"SELECT count(*), coalesce(sum({_SQL_CSV_VTAB_VALID}), 0) FROM ({_SQL_CSV_VTAB_TRIMMED})"
+    )
+    _SQL_IMPORT_FROM_CSV_VTAB = f"""
+        INSERT OR IGNORE INTO livros (titulo, autor, ano_publicacao, preco)
+        SELECT t, a, CAST(y AS INTEGER), CAST(replace(p, ',', '.') AS REAL)
+        FROM ({_SQL_CSV_VTAB_TRIMMED})
+        WHERE {_SQL_CSV_VTAB_VALID}
+    """
+
+    # Esquema criado via `executescript`. Os CHECKs repetem o
+    # limite de 200 caracteres de `validate_text` (valem só para bancos novos).
+    _SQL_SCHEMA = """
+        CREATE TABLE IF NOT EXISTS livros (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            titulo TEXT NOT NULL CHECK (length(titulo) <= 200),
+            autor TEXT NOT NULL CHECK (length(autor) <= 200),
+            ano_publicacao INTEGER NOT NULL,
+            preco REAL NOT NULL
+        );
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_livro_unique
+        ON livros (titulo, autor, ano_publicacao);
+    """
+
+    # Índice de texto (FTS5, tokenizador `trigram`) sobre o autor, mantido por
+    # triggers. Responde a `autor LIKE '%termo%'` pelo índice de trigramas,
+    # com o mesmo resultado do LIKE na tabela, em vez de varrer `livros`.
+    _SQL_FTS_EXISTS = "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'livros_fts'"
+    _SQL_FTS_INSERT_TRIGGER = """
+        CREATE TRIGGER IF NOT EXISTS livros_fts_ai AFTER INSERT ON livros BEGIN
+            INSERT INTO livros_fts (rowid, autor) VALUES (new.id, new.autor);
+        END
+    """
+    _SQL_FTS_SCHEMA = f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS livros_fts
+        USING fts5(autor, content='livros', content_rowid='id', tokenize='trigram');
+        {_SQL_FTS_INSERT_TRIGGER};
+        CREATE TRIGGER IF NOT EXISTS livros_fts_ad AFTER DELETE ON livros BEGIN
+            INSERT INTO livros_fts (livros_fts, rowid, autor) VALUES ('delete', old.id, old.autor);
+        END;
+        CREATE TRIGGER IF NOT EXISTS livros_fts_au AFTER UPDATE OF autor ON livros BEGIN
+            INSERT INTO livros_fts (livros_fts, rowid, autor) VALUES ('delete', old.id, old.autor);
+            INSERT INTO livros_fts (rowid, autor) VALUES (new.id, new.autor);
+        END;
+    """
+    _SQL_FTS_REBUILD = "INSERT INTO livros_fts (livros_fts) VALUES ('rebuild')"
+    # Cargas em lote: o trigger de inserção é suspenso e as linhas novas (ids
+    # acima do maior id anterior, garantido pelo AUTOINCREMENT) são indexadas
+    # num único INSERT ... SELECT ao final da carga.
+    _SQL_MAX_ID = "SELECT coalesce(max(id), 0) FROM livros"
+    _SQL_FTS_DROP_INSERT_TRIGGER = "DROP TRIGGER IF EXISTS livros_fts_ai"
+    _SQL_FTS_INDEX_NEW = "INSERT INTO livros_fts (rowid, autor) SELECT id, autor FROM livros WHERE id > ?"
+    _SQL_FIND_BY_AUTHOR_FTS = (
+        "SELECT id, titulo, autor, ano_publicacao, preco FROM livros "
+        "WHERE id IN (SELECT rowid FROM livros_fts WHERE autor LIKE ?) ORDER BY id"
+    )
+
+    def __init__(self, db_path: str | Path, mmap_size: int = DEFAULT_MMAP_SIZE):
+        """
+        Abre a conexão persistente e garante o esquema da tabela `livros`.
+        `mmap_size` define quantos bytes do arquivo o SQLite mapeia em memória
+        para leituras (256 MB por padrão; aumente para bancos maiores, 0 desativa).
+        """
         self.db_path = str(db_path)
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS livros (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    titulo TEXT NOT NULL,
-                    autor TEXT NOT NULL,
-                    ano_publicacao INTEGER NOT NULL,
-                    preco REAL NOT NULL
-                )
-            """)
-            conn.execute("""
-                CREATE UNIQUE INDEX IF NOT EXISTS idx_livro_unique
-                ON livros (titulo, autor, ano_publicacao)
-            """)
-            conn.commit()
+        self._mmap_size = int(mmap_size)
+        # Conexão somente leitura das exportações e relatórios, aberta sob demanda.
+        self._ro_conn: sqlite3.Connection | None = None
+        conn = sqlite3.connect(
+            self.db_path, check_same_thread=False, isolation_level=None, cached_statements=256
+        )
+        # WAL não se aplica a bancos em memória.
+        if self.db_path != ":memory:":
+            conn.executescript(
+                "PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL; PRAGMA temp_store=MEMORY; "
+                "PRAGMA cache_size=-64000; PRAGMA busy_timeout=5000;"
+            )
+            conn.execute(f"PRAGMA mmap_size={int(mmap_size)}")
+        self._conn = conn
+        self._lock = threading.RLock()
+        # Cursor reaproveitado pelas escritas pontuais (sempre sob `_lock`).
+        self._cur = conn.cursor()
+        # Resultado de `get_all_books`, descartado a cada escrita (None = inválido).
+        self._all_books_cache: List[Tuple[int, str, str, int, float]] | None = None
+        atexit.register(self.close)
+        conn.executescript(self._SQL_SCHEMA)
+        self._has_fts = self._ensure_fts()
+
+    def _ensure_fts(self) -> bool:
+        """
+        Cria o índice `livros_fts` e seus triggers, preenchendo-o com os livros
+        já existentes na primeira vez. Retorna False se o SQLite não tiver FTS5
+        (ou o tokenizador `trigram`); nesse caso a busca por autor usa o LIKE.
+        """
+        conn = self._conn
+        created = conn.execute(self._SQL_FTS_EXISTS).fetchone() is None
+        try:
+            conn.executescript(self._SQL_FTS_SCHEMA)
+        except sqlite3.OperationalError:
+            return False
+        if created:
+            conn.execute(self._SQL_FTS_REBUILD)
+        return True
+
+    @contextmanager
+    def _fts_batch(self) -> Iterator[None]:
+        """
+        Envolve uma carga em lote (dentro de uma transação): suspende o trigger
+        de inserção do `livros_fts` e indexa as linhas novas ao final.
+        """
+        if not self._has_fts:
+            yield
+            return
+        conn = self._conn
+        last_id = conn.execute(self._SQL_MAX_ID).fetchone()[0]
+        conn.execute(self._SQL_FTS_DROP_INSERT_TRIGGER)
+        yield
+        conn.execute(self._SQL_FTS_INDEX_NEW, (last_id,))
+        conn.execute(self._SQL_FTS_INSERT_TRIGGER)
+
+    def close(self) -> None:
+        """
+        Fecha a conexão persistente com o banco de dados.
+        Pode ser chamado mais de uma vez sem erro.
+        """
+        atexit.unregister(self.close)
+        if self._ro_conn is not None:
+            self._ro_conn.close()
+            self._ro_conn = None
+        self._conn.close()
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """
+        Agrupa várias escritas numa única transação explícita (um único commit).
+        Se já houver uma transação aberta, apenas participa dela.
+        Em caso de exceção, desfaz tudo com `rollback` e propaga o erro.
+        Ao terminar (commit ou rollback), invalida o cache de `get_all_books`.
+        """
+        with self._lock:
+            if self._conn.in_transaction:
+                yield self._conn
+                return
+            self._conn.execute("BEGIN")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.rollback()
+                raise
+            else:
+                self._conn.commit()
+            finally:
+                self._all_books_cache = None
+
+    @contextmanager
+    def fast_ingest(self) -> Iterator[None]:
+        """
+        Ajusta PRAGMAs para cargas em lote (ver `INGEST_PRAGMAS`) e restaura os
+        valores anteriores ao sair. Deve envolver a transação da carga (fora
+        dela), e só ser usado em importações precedidas de backup: com
+        `synchronous=OFF`, uma queda de energia pode perder o último commit.
+        """
+        with self._lock:
+            conn = self._conn
+            saved = {name: conn.execute(f"PRAGMA {name}").fetchone()[0] for name in INGEST_PRAGMAS}
+            for name, value in INGEST_PRAGMAS.items():
+                conn.execute(f"PRAGMA {name}={value}")
+            try:
+                yield
+            finally:
+                for name, value in saved.items():
+                    conn.execute(f"PRAGMA {name}={value}")
+
+    def backup_to(self, path: str | Path, pages: int = -1) -> Path:
+        """
+        Copia o banco para `path` pela API de backup online do SQLite, a partir
+        da conexão persistente: as páginas são lidas com o lock do banco, sem
+        copiar o arquivo (nem o WAL) pelo sistema de arquivos. `pages` define
+        quantas páginas copiar por passo (-1 copia tudo de uma vez).
+        Retorna o caminho do backup.
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        dst = sqlite3.connect(path)
+        try:
+            with self._lock:
+                self._conn.backup(dst, pages=pages)
+        finally:
+            dst.close()
+        return path
 
     def add_book(self, titulo: str, autor: str, ano: int, preco: float) -> int:
         """
@@ -30,40 +253,131 @@ class DBManager:
           1 se inseriu,
           0 se ignorou (duplicado).
         """
-        with sqlite3.connect(self.db_path) as conn:
-            cur = conn.execute(
-                "INSERT OR IGNORE INTO livros (titulo, autor, ano_publicacao, preco) VALUES (?, ?, ?, ?)",
-                (titulo, autor, ano, preco)
-            )
-            conn.commit()
+        with self._lock:
+            cur = self._cur
+            cur.execute(self._SQL_INSERT, (titulo, autor, ano, preco))
+            self._all_books_cache = None
             return cur.rowcount
 
+    def add_books_bulk(self, rows: Iterable[Tuple[str, str, int, float]]) -> int:
+        """
+        Insere vários livros numa única transação via `executemany`.
+        Duplicatas são ignoradas, como em `add_book`.
+        Retorna o número de livros efetivamente inseridos.
+        """
+        with self.transaction(), self._fts_batch():
+            cur = self._conn.executemany(self._SQL_INSERT, rows)
+        return cur.rowcount
+
+    def import_csv_native(self, csv_path: str | Path, extension: str | Path | None = None) -> Tuple[int, int]:
+        """
+        Importa um CSV com cabeçalho padrão (titulo, autor, ano_publicacao, preco)
+        sem passar pelo Python: a extensão `csv` do SQLite expõe o arquivo como
+        tabela virtual e um único INSERT ... SELECT insere as linhas.
+        `extension` é o caminho absoluto da biblioteca da extensão (ou, se omitido,
+        `CSV_EXTENSION_PATH`); não se procura a extensão no caminho de busca.
+        Retorna (inseridos, duplicados). Levanta `sqlite3.Error`, sem inserir nada,
+        se a extensão não for informada ou não puder ser carregada, se faltar
+        alguma coluna, se o arquivo não puder ser lido ou se alguma linha não
+        passar na validação (`sqlite3.DataError`): nesses casos vale a importação
+        em Python, que aponta o erro de cada linha.
+        """
+        extension = extension or CSV_EXTENSION_PATH
+        if not extension or not Path(extension).is_absolute():
+            raise sqlite3.NotSupportedError("Caminho absoluto da extensão csv do SQLite não configurado.")
+        conn = self._conn
+        if not hasattr(conn, "enable_load_extension"):
+            raise sqlite3.NotSupportedError("Este Python não permite carregar extensões do SQLite.")
+        filename = str(csv_path).replace("'", "''")
+        max_year = datetime.now().year + 1
+        with self._lock:
+            conn.enable_load_extension(True)
+            try:
+                conn.load_extension(str(extension))
+            finally:
+                conn.enable_load_extension(False)
+            conn.execute(f"CREATE VIRTUAL TABLE temp.livros_csv USING csv(filename='{filename}', header=YES)")
+            try:
+                total, valid = conn.execute(self._SQL_CSV_VTAB_COUNT, (max_year,)).fetchone()
+                if valid < total:
+                    raise sqlite3.DataError(f"{total - valid} linha(s) do CSV fora do padrão.")
+                with self.transaction(), self._fts_batch():
+                    cur = conn.execute(self._SQL_IMPORT_FROM_CSV_VTAB, (max_year,))
+            finally:
+                conn.execute("DROP TABLE IF EXISTS temp.livros_csv")
+        return cur.rowcount, total - cur.rowcount
+
     def get_all_books(self) -> List[Tuple[int, str, str, int, float]]:
-        with sqlite3.connect(self.db_path) as conn:
-            return conn.execute(
-                "SELECT id, titulo, autor, ano_publicacao, preco FROM livros ORDER BY id"
-            ).fetchall()
+        """
+        Retorna todos os livros ordenados por id. O resultado fica em cache até
+        a próxima escrita feita por este `DBManager`; a lista é compartilhada
+        entre as chamadas e não deve ser modificada por quem a recebe.
+        """
+        cached = self._all_books_cache
+        if cached is None:
+            with self._lock:
+                cached = self._all_books_cache = self._conn.execute(self._SQL_SELECT_ALL).fetchall()
+        return cached
+
+    def count_books(self) -> int:
+        """
+        Retorna o total de livros; usa o cache de `get_all_books` se estiver válido.
+        """
+        cached = self._all_books_cache
+        if cached is not None:
+            return len(cached)
+        return self._conn.execute(self._SQL_COUNT).fetchone()[0]
+
+    def _reader(self) -> sqlite3.Connection:
+        """
+        Retorna a conexão somente leitura (`mode=ro`, com o mesmo `mmap_size`),
+        criando-a na primeira chamada. Ela lê os dados já confirmados sem
+        disputar o lock da conexão de escrita. Bancos em memória não são
+        compartilháveis entre conexões e usam a conexão principal.
+        """
+        if self.db_path == ":memory:":
+            return self._conn
+        ro = self._ro_conn
+        if ro is None:
+            uri = Path(self.db_path).resolve().as_uri() + "?mode=ro"
+            ro = sqlite3.connect(uri, uri=True, check_same_thread=False, isolation_level=None)
+            ro.execute(f"PRAGMA mmap_size={self._mmap_size}")
+            self._ro_conn = ro
+        return ro
+
+    def iter_books(self, chunk: int = 1000, *, readonly: bool = False) -> Iterator[Tuple[int, str, str, int, float]]:
+        """
+        Percorre todos os livros sem materializar a tabela inteira:
+        as linhas são lidas do cursor em blocos de `chunk`. Com `readonly=True`,
+        a leitura usa a conexão somente leitura (ver `_reader`), que não enxerga
+        escritas de uma transação ainda aberta na conexão principal.
+        """
+        conn = self._reader() if readonly else self._conn
+        cur = conn.execute(self._SQL_SELECT_ALL)
+        cur.arraysize = chunk
+        while (rows := cur.fetchmany(chunk)):
+            yield from rows
 
     def update_price(self, book_id: int, new_price: float) -> int:
-        with sqlite3.connect(self.db_path) as conn:
-            cur = conn.execute(
-                "UPDATE livros SET preco = ? WHERE id = ?",
-                (new_price, book_id)
-            )
-            conn.commit()
+        with self._lock:
+            cur = self._cur
+            cur.execute(self._SQL_UPDATE_PRICE, (new_price, book_id))
+            self._all_books_cache = None
             return cur.rowcount
 
     def remove_book(self, book_id: int) -> int:
-        with sqlite3.connect(self.db_path) as conn:
-            cur = conn.execute("DELETE FROM livros WHERE id = ?", (book_id,))
-            conn.commit()
+        with self._lock:
+            cur = self._cur
+            cur.execute(self._SQL_DELETE, (book_id,))
+            self._all_books_cache = None
             return cur.rowcount
 
     def find_books_by_author(self, termo: str) -> List[Tuple[int, str, str, int, float]]:
+        """
+        Busca livros cujo autor contém `termo` (LIKE '%termo%'). Com 3 ou mais
+        caracteres, a busca usa o índice de trigramas `livros_fts`; termos
+        menores não formam trigramas e seguem pela varredura com LIKE.
+        """
         like = f"%{termo}%"
-        with sqlite3.connect(self.db_path) as conn:
-            return conn.execute(
-                "SELECT id, titulo, autor, ano_publicacao, preco "
-                "FROM livros WHERE autor LIKE ? ORDER BY id",
-                (like,)
-            ).fetchall()
+        sql = self._SQL_FIND_BY_AUTHOR_FTS if self._has_fts and len(termo) >= 3 else self._SQL_FIND_BY_AUTHOR
+        return self._conn.execute(sql, (like,)).fetchall()
@@ -1,61 +1,239 @@
 import csv
-import shutil
-from datetime import datetime
+import heapq
+import os
+import re
+import sqlite3
+import time
+from functools import lru_cache
+from itertools import chain, islice
+from operator import itemgetter
 from pathlib import Path
-from typing import List, Tuple, Optional
+from typing import Any, Callable, Iterable, List, Tuple, Optional, TypeVar
 
 from . import mapping
-from .validators import (_normalize_row, validate_text, validate_year, validate_price, ValidationError)
+from .validators import (_normalize_row, _row_normalizer, _validate_row_fast, validate_text, validate_year, validate_price, validate_batch, ValidationError)
+
+T = TypeVar("T")
+
+# Quantidade de linhas válidas enviadas ao banco por vez em `import_from_csv`.
+IMPORT_BATCH_SIZE = 1000
+
+# Tamanho do buffer de leitura/escrita dos arquivos CSV (1 MB).
+CSV_BUFFER_SIZE = 1 << 20
+
+# Tamanho máximo da amostra usada para detectar o dialect de um CSV (8 KB).
+SNIFF_SAMPLE_MAX = 8 * 1024
+
+# Tamanho da amostra entregue ao `csv.Sniffer` (2 KB).
+SNIFFER_SAMPLE_MAX = 2 * 1024
+
+# A partir deste tamanho, `import_from_csv` usa o leitor do `pyarrow` (se instalado).
+ARROW_MIN_BYTES = 1 << 20
+
+# Quantidade de livros inspecionados em `export_to_csv` para decidir o cabeçalho.
+EXPORT_CHUNK_SIZE = 1000
+
+
+_DELIMITERS = ",;\t|"
+
+# Dialects prontos para cada delimitador aceito (demais regras iguais às do Excel).
+_DIALECT_BY_DELIM = {
+    d: csv.excel if d == "," else type(f"_excel_{ord(d)}", (csv.excel,), {"delimiter": d})
+    for d in _DELIMITERS
+}
+
+_QUOTED_RE = re.compile(r'"[^"]*"')
+
+# Remove a coluna `id` de uma linha normalizada (tudo a partir do 2º campo).
+_DROP_ID = itemgetter(slice(1, None))
+
+
+def _header_delim(sample: str) -> Optional[str]:
+    """
+    Olha só a primeira linha (o cabeçalho): se exatamente um dos delimitadores
+    aceitos aparecer nela (fora de aspas), ele é o delimitador do arquivo.
+    """
+    end = sample.find("\n")
+    first = _QUOTED_RE.sub("", sample if end < 0 else sample[:end])
+    found = [d for d in _DELIMITERS if d in first]
+    return found[0] if len(found) == 1 else None
+
+
+def _fast_detect_delim(sample: str, max_lines: int = 20) -> Optional[str]:
+    """
+    Escolhe o delimitador pela uniformidade da tabela: conta cada candidato por
+    linha (ignorando trechos entre aspas) nas primeiras linhas e fica com o que
+    aparece o mesmo número de vezes em todas. Retorna `None` se for inconclusivo.
+    """
+    lines = sample.splitlines()
+    if len(sample) >= SNIFF_SAMPLE_MAX and len(lines) > 1:
+        lines.pop()  # a última linha pode ter sido cortada pela amostra
+    lines = [_QUOTED_RE.sub("", line) for line in lines[:max_lines] if line.strip()]
+    if not lines:
+        return None
+
+    uniform = {}
+    for d in _DELIMITERS:
+        counts = {line.count(d) for line in lines}
+        if len(counts) == 1 and (n := counts.pop()) > 0:
+            uniform[d] = n
+    if not uniform:
+        return None
+    best = max(uniform.values())
+    winners = [d for d, n in uniform.items() if n == best]
+    return winners[0] if len(winners) == 1 else None
+
+
+def _connect_creating_dir(path: Path) -> sqlite3.Connection:
+    """
+    Abre (ou cria) um banco SQLite. As pastas já existem desde `ensure_dirs`,
+    então a pasta pai só é criada se a abertura falhar por ela ter sumido.
+    """
+    try:
+        return sqlite3.connect(path)
+    except sqlite3.OperationalError:
+        os.makedirs(path.parent, exist_ok=True)
+        return sqlite3.connect(path)
+
+
+@lru_cache(maxsize=32)
+def _detect_dialect_cached(sample_text: str) -> csv.Dialect:
+    """
+    Detecta o dialect pelo cabeçalho ou pela contagem de delimitadores e, se
+    inconclusivo, executa o `csv.Sniffer` sobre o início da amostra; na falha,
+    assume `csv.excel`.
+    """
+    sample_text = sample_text[:SNIFF_SAMPLE_MAX]
+    delim = _header_delim(sample_text) or _fast_detect_delim(sample_text)
+    if delim is not None:
+        return _DIALECT_BY_DELIM[delim]
+    try:
+        return csv.Sniffer().sniff(sample_text[:SNIFFER_SAMPLE_MAX], delimiters=_DELIMITERS)
+    except Exception:
+        return csv.excel
+
+
+# Diretórios já criados/verificados neste processo, compartilhados por
+# `FileManager` e pelos relatórios de `lib.reporting`.
+_ensured_dirs: set[str] = set()
+
+
+def ensure_dir(path: str | Path) -> None:
+    """
+    Garante que a pasta exista. Pastas já garantidas neste processo não são verificadas de novo.
+    """
+    key = str(path)
+    if key not in _ensured_dirs:
+        os.makedirs(key, exist_ok=True)
+        _ensured_dirs.add(key)
+
+
+def with_parent_dir(path: Path, action: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    Executa `action(path, *args, **kwargs)` (ex.: `open`) com a pasta pai de
+    `path` garantida por `ensure_dir`. Se a pasta tiver sido apagada depois de
+    entrar no cache, a ação falha com `FileNotFoundError`: a entrada é
+    descartada, a pasta recriada e a ação repetida uma vez.
+    """
+    parent = path.parent
+    ensure_dir(parent)
+    try:
+        return action(path, *args, **kwargs)
+    except FileNotFoundError:
+        _ensured_dirs.discard(str(parent))
+        ensure_dir(parent)
+        return action(path, *args, **kwargs)
+
+
+# Intervalo mínimo, em segundos, entre backups automáticos antes de
+# alterações pontuais (ver `FileManager.backup_db_if_due`).
+BACKUP_MIN_INTERVAL_S = 60
 
 
 class FileManager:
     """
     Gerencia a estrutura de arquivos e diretórios da aplicação.
     """
-    def __init__(self, base_dir: Path):
+    def __init__(self, base_dir: Path, default_dialect: Optional[str | csv.Dialect] = None):
+        """
+        `default_dialect` (ex.: "excel") pode ser informado quando o formato dos
+        CSVs já é conhecido, dispensando a detecção automática do delimitador.
+        """
         self.base_dir = base_dir
         self.data_dir = self.base_dir / "data"
         self.backup_dir = self.base_dir / "backups"
         self.exports_dir = self.base_dir / "exports"
         self.db_path = self.data_dir / "livraria.db"
         self.max_backups = 5
+        self.default_dialect = default_dialect
+        # Momento (relógio monotônico) do último backup feito por esta instância.
+        self._last_backup_ts: Optional[float] = None
         self.ensure_dirs()
 
     def ensure_dirs(self) -> None:
         """
         Cria os diretórios 'data', 'backups' e 'exports' se eles não existirem.
+        Diretórios já garantidos neste processo não são verificados de novo.
         """
         for d in (self.data_dir, self.backup_dir, self.exports_dir):
-            d.mkdir(parents=True, exist_ok=True)
+            ensure_dir(d)
 
-    def backup_db(self) -> Path:
+    def backup_db(self, db=None) -> Path:
         """
-        Cria um backup do arquivo do banco de dados.
+        Cria um backup do banco de dados usando a API de backup online do SQLite,
+        que copia as páginas de forma consistente mesmo com o banco em uso (WAL).
+        Se um `DBManager` for informado, a cópia é feita por `DBManager.backup_to`,
+        a partir da conexão já aberta. Todas as páginas são copiadas num único
+        passo (`pages=-1`) e nenhum metadado do arquivo original é replicado.
         """
-        timestamp = datetime.now().strftime("%Y-%m-%d_%H%M%S")
+        # Carimbo de largura fixa: ordenar os nomes é ordenar os backups por data.
+        timestamp = time.strftime("%Y-%m-%d_%H%M%S")
         backup_file = self.backup_dir / f"backup_livraria_{timestamp}.db"
-        if not self.db_path.exists():
-            self.db_path.parent.mkdir(parents=True, exist_ok=True)
-            with open(self.db_path, "w", encoding="utf-8"):
-                pass
-        shutil.copy2(self.db_path, backup_file)
+        if db is not None:
+            db.backup_to(backup_file)
+        else:
+            src = _connect_creating_dir(self.db_path)
+            dst = _connect_creating_dir(backup_file)
+            try:
+                src.backup(dst, pages=-1)
+            finally:
+                dst.close()
+                src.close()
+        self._last_backup_ts = time.monotonic()
         self.clean_old_backups()
         return backup_file
 
+    def backup_db_if_due(self, db=None, min_interval_s: float = BACKUP_MIN_INTERVAL_S) -> Optional[Path]:
+        """
+        Faz o backup só se o último tiver sido há pelo menos `min_interval_s`
+        segundos (ou se ainda não houve backup). Usado antes de alterações
+        pontuais, para que uma sequência de edições não copie o banco a cada uma.
+        Retorna o caminho do backup criado, ou `None` se ainda não era a hora.
+        """
+        last = self._last_backup_ts
+        if last is not None and time.monotonic() - last < min_interval_s:
+            return None
+        return self.backup_db(db)
+
     def clean_old_backups(self) -> None:
         """
         Remove os arquivos de backup mais antigos.
         """
-        backups = sorted(
-            self.backup_dir.glob("backup_livraria_*.db"),
-            key=lambda p: p.stat().st_mtime,
-            reverse=True,
-        )
-        for old in backups[self.max_backups:]:
+        with os.scandir(self.backup_dir) as it:
+            entries = [
+                (e.stat().st_mtime, e.path, e.name) for e in it
+                if e.name.startswith("backup_livraria_") and e.name.endswith(".db")
+                and e.is_file(follow_symlinks=False)
+            ]
+        # Caso comum: nada a remover, então nem é preciso ordenar.
+        excess = len(entries) - self.max_backups
+        if excess <= 0:
+            return
+        for _, path, name in heapq.nsmallest(excess, entries):
             try:
-                old.unlink()
+                os.unlink(path)
             except Exception as e:
-                print(f"[Aviso] Não foi possível remover backup '{old.name}': {e}")
+                print(f"[Aviso] Não foi possível remover backup '{name}': {e}")
 
 
 # A anotação @staticmethod em Python transforma uma função dentro de uma classe em um método estático, ou seja:
@@ -65,98 +243,203 @@ class FileManager:
     def _detect_dialect(sample_text: str) -> csv.Dialect:
         """
         Tenta detectar o delimitador (dialect) de um arquivo CSV.
+        O resultado é memorizado por amostra, evitando rodar o Sniffer de novo
+        em reimportações do mesmo arquivo.
         """
-        try:
-            return csv.Sniffer().sniff(sample_text, delimiters=",;\t|")
-        except Exception:
-            return csv.excel
+        return _detect_dialect_cached(sample_text)
 
-    def export_to_csv(self, books: List[Tuple], outfile_name: str = "livros_exportados.csv") -> Path:
+    def export_to_csv(self, books: Iterable[Tuple], outfile_name: str = "livros_exportados.csv") -> Path:
         """
-        Exporta uma lista de dados de livros para um arquivo CSV.
+        Exporta uma lista (ou qualquer iterável) de dados de livros para um arquivo CSV.
+        A coluna `id` é gravada se algum livro tiver id. Se o primeiro bloco de
+        livros já tiver um, o restante é gravado em fluxo, sem montar a lista
+        inteira em memória; senão, os demais livros são lidos antes de decidir.
+        Se o primeiro bloco só tiver tuplas de 5 campos com id inteiro (formato
+        do banco), essas tuplas são gravadas sem normalização.
         """
         path = self.exports_dir / outfile_name
-        self.exports_dir.mkdir(parents=True, exist_ok=True)
 
-        normalized_rows = [_normalize_row(item) for item in books]
-        has_any_id = any(r[0] is not None for r in normalized_rows)
+        items = iter(books)
+        first = list(islice(items, EXPORT_CHUNK_SIZE))
+
+        if first and all(type(r) is tuple and len(r) == 5 and isinstance(r[0], int) for r in first):
+            # Tuplas (id, titulo, autor, ano, preco) como as do banco já estão no
+            # formato final: vão direto para o arquivo, sem normalização. Itens
+            # seguintes em outro formato ainda passam por `_normalize_row`.
+            header = ["id", "titulo", "autor", "ano_publicacao", "preco"]
+            rows = chain(first, (r if type(r) is tuple and len(r) == 5 else _normalize_row(r) for r in items))
+        else:
+            normalize = _row_normalizer(first[0]) if first else _normalize_row
+            chunk = list(map(normalize, first))
+            has_any_id = any(r[0] is not None for r in chunk)
+            if has_any_id:
+                rows = chain(chunk, map(normalize, items))
+            else:
+                # Sem id no primeiro bloco: um livro com id mais adiante ainda
+                # exige a coluna, então o restante é lido antes de decidir.
+                chunk.extend(map(normalize, items))
+                has_any_id = any(r[0] is not None for r in chunk)
+                rows = chunk if has_any_id else map(_DROP_ID, chunk)
 
-        header = ["id", "titulo", "autor", "ano_publicacao", "preco"] if has_any_id \
-                 else ["titulo", "autor", "ano_publicacao", "preco"]
+            header = ["id", "titulo", "autor", "ano_publicacao", "preco"] if has_any_id \
+                     else ["titulo", "autor", "ano_publicacao", "preco"]
 
-        with open(path, "w", newline="", encoding="utf-8") as f:
+        with with_parent_dir(path, open, "w", newline="", encoding="utf-8", buffering=CSV_BUFFER_SIZE) as f:
             writer = csv.writer(f)
             writer.writerow(header)
-            for r in normalized_rows:
-                writer.writerow(r if has_any_id else r[1:])
+            writer.writerows(rows)
         return path
 
-    def get_csv_data(self, csv_path: str) -> List[dict]:
+    def import_csv(self, db, csv_path: str) -> Tuple[int, int, List[str]]:
         """
-        Lê um arquivo CSV e retorna os dados como uma lista de dicionários.
+        Importa um CSV para o banco pelo mesmo caminho de `import_from_csv`, usando o dialect
+        configurado (ou detectado). Levanta `FileNotFoundError` se o arquivo não
+        existir. Retorna (inseridos, ignorados, mensagens de erro).
         """
-        path = Path(csv_path).expanduser().resolve()
-        if not path.exists():
-            raise FileNotFoundError("Arquivo não encontrado.")
+        return _import_csv_file(db, os.path.expanduser(csv_path), self.default_dialect)
 
-        with open(path, "r", encoding="utf-8") as f:
-            sample = f.read(4096)
-            f.seek(0)
-            dialect = self._detect_dialect(sample)
-            reader = csv.DictReader(f, dialect=dialect)
-            return [row for row in reader]
+
+# Colunas obrigatórias do CSV (nome padrão, nome exibido se faltar), na ordem de inserção.
+_REQUIRED_COLUMNS = (("titulo", "titulo"), ("autor", "autor"), ("ano_publicacao", "ano"), ("preco", "preco"))
 
 
-def import_from_csv(db, csv_path: str):
+def _resolve_columns(fieldnames: Optional[List[str]]) -> Tuple[Optional[Tuple[str, str, str, str]], List[str]]:
     """
-    Função independente para importar dados de um arquivo CSV para o banco de dados.
+    Localiza no cabeçalho do CSV as colunas de título, autor, ano e preço,
+    aceitando os sinônimos de `mapping.CSV_COLUMN_ALIASES`.
+    Retorna os nomes originais das colunas (ou `None`) e a lista das que faltam.
     """
-    p = Path(csv_path).expanduser().resolve()
-    if not p.exists():
-        return 0, 0, [f"Arquivo não encontrado: {p}"]
+    # Se dois cabeçalhos forem sinônimos, vale o primeiro.
+    alias_to_canon = mapping.ALIAS_TO_CANON
+    col_by_canon = {}
+    for h in fieldnames or []:
+        canon = alias_to_canon.get((h or "").strip().lower())
+        if canon and canon not in col_by_canon:
+            col_by_canon[canon] = h
 
-    inserted, skipped, errors = 0, 0, []
+    if len(col_by_canon) < len(_REQUIRED_COLUMNS):
+        return None, [label for canon, label in _REQUIRED_COLUMNS if canon not in col_by_canon]
+    return tuple(col_by_canon[canon] for canon, _ in _REQUIRED_COLUMNS), []
 
-    with p.open("r", encoding="utf-8") as f:
-        sample = f.read(4096)
-        f.seek(0)
-        dialect = FileManager._detect_dialect(sample)
-        reader = csv.DictReader(f, dialect=dialect)
-        
-        raw_headers = { (h or "").strip().lower(): h for h in (reader.fieldnames or []) }
 
-        def find_col_name(*aliases: str) -> Optional[str]:
-            for alias in aliases:
-                if alias in raw_headers:
-                    return raw_headers[alias]
-            return None
+def _store_rows(db, valid_rows: Iterable[Tuple[str, str, int, float]], errors: List[str]) -> Tuple[int, int, List[str]]:
+    """
+    Insere linhas já validadas em lotes de `IMPORT_BATCH_SIZE`, tudo dentro de
+    uma única transação. Conta como ignoradas as duplicatas e as linhas em `errors`.
+    """
+    inserted, duplicates = 0, 0
+    rows = iter(valid_rows)
+    try:
+        with db.transaction():
+            while (batch := list(islice(rows, IMPORT_BATCH_SIZE))):
+                added = db.add_books_bulk(batch)
+                inserted += added
+                duplicates += len(batch) - added
+    except sqlite3.Error as e:
+        # A transação foi desfeita: nenhuma linha do arquivo foi gravada.
+        invalid = len(errors)
+        errors.append(f"Erro no banco de dados: {e}")
+        return 0, invalid, errors
 
-        col_titulo = find_col_name(*mapping.CSV_COLUMN_ALIASES["titulo"])
-        col_autor = find_col_name(*mapping.CSV_COLUMN_ALIASES["autor"])
-        col_ano = find_col_name(*mapping.CSV_COLUMN_ALIASES["ano_publicacao"])
-        col_preco = find_col_name(*mapping.CSV_COLUMN_ALIASES["preco"])
+    return inserted, duplicates + len(errors), errors
 
-        missing = [name for name, col in {
-            "titulo": col_titulo, "autor": col_autor, "ano": col_ano, "preco": col_preco
-        }.items() if col is None]
 
-        if missing:
-            errors.append(f"Cabeçalho inválido. Colunas faltando: {', '.join(missing)}")
-            return 0, 0, errors
+def _insert_rows(db, rows: Iterable[Tuple[Any, Any, Any, Any]]) -> Tuple[int, int, List[str]]:
+    """
+    Valida cada linha (titulo, autor, ano, preco) e insere as válidas no banco.
+    """
+    errors: List[str] = []
 
-        for i, row in enumerate(reader, start=2):
+    def validated():
+        vt, vy, vp, fast = validate_text, validate_year, validate_price, _validate_row_fast
+        add_error = errors.append
+        for i, (titulo, autor, ano, preco) in enumerate(rows, start=2):
+            row = fast(titulo, autor, ano, preco)
+            if row is not None:
+                yield row
+                continue
             try:
-                titulo = validate_text("Título", row.get(col_titulo, ""))
-                autor = validate_text("Autor", row.get(col_autor, ""))
-                ano = validate_year("Ano", row.get(col_ano, ""))
-                preco = validate_price("Preço", row.get(col_preco, ""))
-                
-                if db.add_book(titulo, autor, ano, preco):
-                    inserted += 1
-                else:
-                    skipped += 1
+                yield vt("Título", titulo), vt("Autor", autor), vy("Ano", ano), vp("Preço", preco)
             except ValidationError as e:
-                errors.append(f"Linha {i}: {e}")
-                skipped += 1
+                add_error(f"Linha {i}: {e}")
+
+    return _store_rows(db, validated(), errors)
+
+
+def _import_with_arrow(db, path: str, dialect: str | csv.Dialect, cols: Tuple[str, str, str, str]):
+    """
+    Variante de `import_from_csv` para arquivos grandes: o parsing é feito pelo
+    leitor do `pyarrow`, e as colunas resultantes são validadas em lote
+    por `validate_batch` antes da mesma inserção em lote do caminho padrão.
+    Retorna `None`, sem gravar nada, se o `pyarrow` não estiver instalado ou não
+    conseguir ler o arquivo (ex.: uma linha com colunas a menos); nesse caso
+    vale o caminho padrão, que aponta o erro linha a linha.
+    O `pyarrow` é importado só aqui: é pesado e a CLI não passa por este caminho.
+    """
+    try:
+        import pyarrow as pa
+        from pyarrow import csv as pa_csv
+    except ImportError:
+        return None
+
+    if isinstance(dialect, str):
+        dialect = csv.get_dialect(dialect)
+
+    # Todas as colunas são lidas como texto: a conversão fica a cargo dos validadores.
+    try:
+        table = pa_csv.read_csv(
+            path,
+            read_options=pa_csv.ReadOptions(block_size=CSV_BUFFER_SIZE),
+            parse_options=pa_csv.ParseOptions(
+                delimiter=dialect.delimiter,
+                quote_char=dialect.quotechar or False,
+                newlines_in_values=True,
+            ),
+            convert_options=pa_csv.ConvertOptions(
+                column_types={c: pa.string() for c in cols},
+                strings_can_be_null=False,
+                include_columns=list(cols),
+            ),
+        )
+    except pa.ArrowInvalid:
+        return None
+    rows, failures = validate_batch(*(table.column(c) for c in cols))
+    errors = [f"Linha {i + 2}: {msg}" for i, msg in failures]
+    return _store_rows(db, rows, errors)
+
+
+def import_from_csv(db, csv_path: str, dialect: Optional[str | csv.Dialect] = None):
+    """
+    Função independente para importar dados de um arquivo CSV para o banco de dados.
+    Se `dialect` não for informado, o formato é detectado a partir de uma amostra.
+    Arquivos a partir de `ARROW_MIN_BYTES` são lidos com `pyarrow`, se instalado.
+    """
+    path = os.path.expanduser(csv_path)
+    try:
+        return _import_csv_file(db, path, dialect)
+    except FileNotFoundError:
+        return 0, 0, [f"Arquivo não encontrado: {Path(path).resolve()}"]
+
+
+def _import_csv_file(db, path: str, dialect: Optional[str | csv.Dialect]) -> Tuple[int, int, List[str]]:
+    """
+    Corpo de `import_from_csv`. Levanta `FileNotFoundError` se o arquivo não existir.
+    """
+    fd = os.open(path, os.O_RDONLY)
+    with os.fdopen(fd, "r", encoding="utf-8", newline="", buffering=CSV_BUFFER_SIZE) as f:
+        if dialect is None:
+            sample = f.read(4096)
+            f.seek(0)
+            dialect = FileManager._detect_dialect(sample)
+        reader = csv.DictReader(f, dialect=dialect)
+        cols, missing = _resolve_columns(reader.fieldnames)
+        if missing:
+            return 0, 0, [f"Cabeçalho inválido. Colunas faltando: {', '.join(missing)}"]
+
+        if os.fstat(fd).st_size >= ARROW_MIN_BYTES:
+            result = _import_with_arrow(db, path, dialect, cols)
+            if result is not None:
+                return result
 
-    return inserted, skipped, errors
\ No newline at end of file
+        # O DictReader preenche toda chave do cabeçalho (com `None` se a linha for curta).
+        return _insert_rows(db, map(itemgetter(*cols), reader))
@@ -21,4 +21,8 @@ CSV_COLUMN_ALIASES = {
     "autor": ("autor", "author"),
     "ano_publicacao": ("ano_publicacao", "ano", "year"),
     "preco": ("preco", "price"),
-}
\ No newline at end of file
+}
+
+# Índice invertido de `CSV_COLUMN_ALIASES`: cada sinônimo aponta para o nome
+# padrão da coluna.
+ALIAS_TO_CANON = {alias: canon for canon, aliases in CSV_COLUMN_ALIASES.items() for alias in aliases}
@@ -1,14 +1,16 @@
 from __future__ import annotations
+import mmap
+from collections.abc import Sized
 from datetime import datetime
 from string import Template
-from typing import Iterable, Any
+from typing import Callable, Iterable, Iterator, Any, Tuple
 from pathlib import Path
-from .validators import _normalize_books
+from .file_manager import with_parent_dir
+from .validators import _normalize_row
 
-try:
-    from xhtml2pdf import pisa
-except ImportError:
-    pisa = None
+# Renderizador de PDF, escolhido e importado só na primeira geração de PDF:
+# xhtml2pdf e WeasyPrint são pesados e atrasariam a inicialização da CLI.
+_pdf_renderer: Callable[[str, Path], None] | None = None
 
 
 def _load_html_template() -> Template:
@@ -17,79 +19,194 @@ def _load_html_template() -> Template:
     """
     try:
         template_path = Path(__file__).parent / "template.html"
-        with open(template_path, "r", encoding="utf-8") as f:
-            return Template(f.read())
+        with open(template_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            text = mm[:].decode("utf-8")
     except FileNotFoundError as e:
         msg = ("O arquivo de template 'template.html' não foi encontrado. "
                "Certifique-se de que ele está na mesma pasta que reporting.py.")
         raise FileNotFoundError(msg) from e
+    if "\r" in text:
+        # Mesmas quebras de linha que a leitura em modo texto produziria.
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return Template(text)
 
 HTML_TEMPLATE = _load_html_template()
 
 
+def _split_template(tpl: Template) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+    """
+    Quebra o template em trechos estáticos e nomes dos campos, já resolvendo
+    os escapes `$$`.
+    """
+    segments, fields, current, pos = [], [], [], 0
+    text = tpl.template
+    for m in tpl.pattern.finditer(text):
+        current.append(text[pos:m.start()])
+        pos = m.end()
+        if m.group("escaped") is not None:
+            current.append(tpl.delimiter)
+            continue
+        name = m.group("named") or m.group("braced")
+        if name is None:
+            raise ValueError(f"Placeholder inválido no template, posição {m.start()}.")
+        segments.append("".join(current))
+        fields.append(name)
+        current = []
+    current.append(text[pos:])
+    segments.append("".join(current))
+    return tuple(segments), tuple(fields)
+
+
+_TEMPLATE_SEGMENTS, _TEMPLATE_FIELDS = _split_template(HTML_TEMPLATE)
+
+# O mesmo template como formato `%` (com os `%` literais escapados).
+_TEMPLATE_FMT = "%s".join(seg.replace("%", "%%") for seg in _TEMPLATE_SEGMENTS)
+
+
+def _fill_template(**values: Any) -> str:
+    """
+    Preenche o template pré-processado; equivale a `HTML_TEMPLATE.substitute`.
+    """
+    return _TEMPLATE_FMT % tuple([values[name] for name in _TEMPLATE_FIELDS])
+
+def _write_template(f, rows: Iterable[str], **values: Any) -> None:
+    """
+    Grava o template pré-processado direto no arquivo `f`, com as linhas
+    da tabela (`rows`) escritas à medida que são geradas.
+    """
+    f.write(_TEMPLATE_SEGMENTS[0])
+    for name, segment in zip(_TEMPLATE_FIELDS, _TEMPLATE_SEGMENTS[1:]):
+        if name == "rows":
+            f.writelines(rows)
+        else:
+            f.write(str(values[name]))
+        f.write(segment)
+
+# Tamanho do buffer de escrita do relatório HTML (1 MB).
+REPORT_BUFFER_SIZE = 1 << 20
+
+# Formato da data/hora de geração exibida nos relatórios.
+REPORT_TIMESTAMP_FMT = "%d/%m/%Y %H:%M"
+
+# Troca o separador decimal do preço ("39.90" -> "39,90").
+_DEC_COMMA = str.maketrans(".", ",")
+
+# Escapes de HTML aplicados por `str.translate`.
+_ESC = str.maketrans({"&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;", "'": "&#39;"})
+
+
+def _esc(value: Any) -> str:
+    """
+    Converte o valor em texto (vazio se ausente) com os caracteres especiais de HTML escapados.
+    """
+    return (value if type(value) is str else str(value) if value else "").translate(_ESC)
+
+# Limite para formatar o preço via centavos inteiros; negativos, valores enormes,
+# `inf`, `nan` e preços com mais de 2 casas decimais seguem pelo `format` com
+# troca do separador.
+_CENTS_MAX = 1e15
+
+def _iter_rows_as_html(books: Iterable[Any]) -> Iterator[str]:
+    """
+    Gera as linhas `<tr>` da tabela: cada livro (tupla, dicionário ou objeto)
+    é formatado e escapado.
+    """
+    fmt, esc, dec_comma, esc_tab, normalize = format, _esc, _DEC_COMMA, _ESC, _normalize_row
+    for b in books:
+        # Tuplas do banco já estão no formato final; o resto passa pela normalização.
+        id_, titulo, autor, ano, preco = b if type(b) is tuple and len(b) == 5 else normalize(b)
+        if isinstance(preco, (int, float)):
+            if 0 <= preco < _CENTS_MAX and round(preco, 2) == preco:
+                # Em centavos inteiros: "R,CC" sem formatar o float e trocar o ponto.
+                reais, cents = divmod(round(preco * 100), 100)
+                preco_str = "%d,%02d" % (reais, cents)
+            else:
+                preco_str = fmt(float(preco), ".2f").translate(dec_comma)
+        else:
+            preco_str = esc(preco)
+        titulo = titulo.translate(esc_tab) if type(titulo) is str else esc(titulo)
+        autor = autor.translate(esc_tab) if type(autor) is str else esc(autor)
+        yield f"<tr><td>{id_}</td><td>{titulo}</td><td>{autor}</td><td>{ano or ''}</td><td>{preco_str}</td></tr>"
+
+
 def _create_html_rows(books: Iterable[Any]) -> str:
     """
     Cria as linhas de uma tabela HTML a partir de uma lista de dados de livros.
     """
-    rows = []
-    normalized = _normalize_books(books)
-    for b in normalized:
-        id_ = b.get("id", "")
-        titulo = b.get("titulo", "") or ""
-        autor = b.get("autor", "") or ""
-        ano = b.get("ano_publicacao", "") or ""
-        preco = b.get("preco")
-        preco_str = f"{float(preco):.2f}".replace(".", ",") if isinstance(preco, (int, float)) else (str(preco) or "")
-        
-        row_html = f"""
-          <tr>
-            <td>{id_}</td><td>{titulo}</td><td>{autor}</td>
-            <td>{ano}</td><td>{preco_str}</td>
-          </tr>
-        """
-        rows.append(row_html)
-    return "".join(rows)
-
-
-def generate_html_report(books: Iterable[Any], outfile: str | Path = "exports/relatorio_livros.html") -> str:
+    return "".join(_iter_rows_as_html(books))
+
+
+def _pdf_backend() -> Callable[[str, Path], None]:
+    """
+    Escolhe o renderizador de PDF: WeasyPrint se instalado, senão xhtml2pdf.
+    A escolha fica guardada no módulo.
+    """
+    global _pdf_renderer
+    if _pdf_renderer is not None:
+        return _pdf_renderer
+
+    try:
+        from weasyprint import HTML
+    except (ImportError, OSError):  # sem as bibliotecas nativas, falha com OSError
+        HTML = None
+
+    if HTML is not None:
+        def render(html: str, outfile: Path) -> None:
+            HTML(string=html).write_pdf(str(outfile))
+    else:
+        try:
+            from xhtml2pdf import pisa
+        except ImportError:
+            raise ImportError("Para gerar PDFs, instale 'xhtml2pdf' (pip install xhtml2pdf) ou 'weasyprint'.") from None
+
+        def render(html: str, outfile: Path) -> None:
+            with open(outfile, "w+b") as pdf_file:
+                pisa_status = pisa.CreatePDF(html.encode("utf-8"), dest=pdf_file)
+            if pisa_status.err:
+                raise RuntimeError(f"Ocorreu um erro ao gerar o PDF. Código: {pisa_status.err}")
+
+    _pdf_renderer = render
+    return render
+
+
+def _report_values(books: Iterable[Any], total: int | None) -> Tuple[Iterable[Any], int, str]:
+    """
+    Prepara os valores comuns aos relatórios: os livros, o total e o carimbo
+    de data/hora da geração. O total aparece antes das linhas: se não for
+    informado, iteráveis sem `len` são materializados para contá-lo.
+    """
+    if total is None:
+        if not isinstance(books, Sized):
+            books = list(books)
+        total = len(books)
+    return books, total, datetime.now().strftime(REPORT_TIMESTAMP_FMT)
+
+
+def generate_html_report(books: Iterable[Any], outfile: str | Path = "exports/relatorio_livros.html",
+                         total: int | None = None) -> str:
     """
     Gera um relatório HTML completo a partir de uma lista de livros.
+    Com `total` informado, `books` pode ser um iterador (ex.: um cursor do
+    banco), consumido em fluxo sem ser materializado.
     """
+    books, total, generated_at = _report_values(books, total)
+    # As linhas vão direto para o arquivo, sem o documento em memória.
     outfile = Path(outfile)
-    outfile.parent.mkdir(parents=True, exist_ok=True)
-    
-    html = HTML_TEMPLATE.substitute(
-        generated_at=datetime.now().strftime("%d/%m/%Y %H:%M"),
-        total=len(list(books)),
-        rows=_create_html_rows(books),
-    )
-    
-    with open(outfile, "w", encoding="utf-8") as f:
-        f.write(html)
-        
+    with with_parent_dir(outfile, open, "w", encoding="utf-8", buffering=REPORT_BUFFER_SIZE) as f:
+        _write_template(f, _iter_rows_as_html(books), generated_at=generated_at, total=total)
     return str(outfile.resolve())
 
 
-def generate_pdf_report(books: Iterable[Any], outfile: str | Path = "exports/relatorio_livros.pdf") -> str:
+def generate_pdf_report(books: Iterable[Any], outfile: str | Path = "exports/relatorio_livros.pdf",
+                        total: int | None = None) -> str:
     """
     Gera um relatório em formato PDF a partir de uma lista de livros.
+    `total` tem o mesmo papel que em `generate_html_report`.
     """
-    if pisa is None:
-        raise ImportError("Para gerar PDFs, instale 'xhtml2pdf' (pip install xhtml2pdf).")
-    
+    render_pdf = _pdf_backend()
+    books, total, generated_at = _report_values(books, total)
+    # O renderizador de PDF precisa do documento HTML completo.
+    html = _fill_template(generated_at=generated_at, total=total, rows=_create_html_rows(books))
     outfile = Path(outfile)
-    outfile.parent.mkdir(parents=True, exist_ok=True)
-    
-    html_content = HTML_TEMPLATE.substitute(
-        generated_at=datetime.now().strftime("%d/%m/%Y %H:%M"),
-        total=len(list(books)),
-        rows=_create_html_rows(books),
-    )
-    
-    with open(outfile, "w+b") as pdf_file:
-        pisa_status = pisa.CreatePDF(html_content.encode("utf-8"), dest=pdf_file)
-        
-    if pisa_status.err:
-        raise RuntimeError(f"Ocorreu um erro ao gerar o PDF. Código: {pisa_status.err}")
-    
-    return str(outfile.resolve())
\ No newline at end of file
+    with_parent_dir(outfile, lambda path: render_pdf(html, path))
+    return str(outfile.resolve())
@@ -1,3 +1,11 @@
+from __future__ import annotations
+from typing import Callable, TypeVar
+
+from .validators import ValidationError
+
+T = TypeVar("T")
+
+
 def input_int(prompt: str) -> int:
     """
     Solicita uma entrada do usuário e garante que o valor seja um número inteiro.
@@ -26,4 +34,18 @@ def input_nonempty(prompt: str) -> str:
         val = input(prompt).strip()
         if val:
             return val
-        print("Este campo não pode ficar vazio.")
\ No newline at end of file
+        print("Este campo não pode ficar vazio.")
+
+
+def input_validated(prompt: str, validator: Callable[[str], T]) -> T:
+    """
+    Solicita uma entrada e a entrega já convertida por `validator`, que recebe o
+    texto digitado e levanta `ValidationError` se ele for inválido. Em caso de
+    erro, a mensagem é exibida e a entrada é pedida novamente.
+    """
+    while True:
+        try:
+            return validator(input(prompt))
+        except ValidationError as e:
+            print(f"⚠ {e}")
+
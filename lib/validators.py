@@ -1,10 +1,29 @@
 from __future__ import annotations
+import heapq
+import operator
 import re
+import time
 from datetime import datetime
-from typing import Any, Mapping, Tuple, Optional, List, Iterable
+from typing import Any, Callable, Mapping, Tuple, Optional, List, Iterable
 
 from . import mapping
 
+# Formatos mais comuns de ano e preço, aceitos direto antes do caminho
+# genérico de conversão.
+_YEAR_RE = re.compile(r"^\d{1,4}$")
+_PRICE_RE = re.compile(r"^\d+(?:[.,]\d+)?$")
+_COMMA2DOT = str.maketrans(",", ".")
+_PRICE_TAB = str.maketrans({" ": None, ",": "."})
+
+# Um texto válido precisa de ao menos uma letra ou dígito (padrão também
+# usado na validação em lote com pyarrow, em `validate_batch`).
+_ALNUM_PATTERN = r"[A-Za-zÀ-ÿ0-9]"
+_HAS_ALNUM = re.compile(_ALNUM_PATTERN).search
+
+# Leitura dos campos canônicos de um livro (dicionário ou objeto).
+_GET_DICT = operator.itemgetter("titulo", "autor", "ano_publicacao", "preco")
+_GET_OBJ = operator.attrgetter("id", "titulo", "autor", "ano_publicacao", "preco")
+
 
 class ValidationError(ValueError):
     """
@@ -29,45 +48,77 @@ def _coerce_str(value: Any) -> str:
     return str(value).strip()
 
 
+# Último ano aceito (ano atual + 1), recalculado no máximo a cada 60 s:
+# [instante monotônico da leitura, valor].
+_year_cache: List[Any] = [float("-inf"), 0]
+
+
+def _current_year_plus_one() -> int:
+    """
+    Retorna o ano atual + 1 sem consultar o relógio a cada validação.
+    """
+    now = time.monotonic()
+    if now - _year_cache[0] > 60:
+        _year_cache[:] = [now, datetime.now().year + 1]
+    return _year_cache[1]
+
+
 def _normalize_decimal_str(s: str) -> str:
     """
     Função auxiliar interna para padronizar a string de um número decimal.
     - Remove espaços em branco.
-    - Converte vírgulas para pontos se a string contiver uma vírgula
-      e não um ponto, o que é um padrão comum em países de língua portuguesa
-      e ajuda a garantir que a conversão para `float` funcione corretamente.
+    - Converte vírgulas para pontos, o que é um padrão comum em países de
+      língua portuguesa e ajuda a garantir que a conversão para `float`
+      funcione corretamente.
+    Uma string com vírgula e ponto continua inválida para `float`, pois fica
+    com dois pontos.
     """
-    s = s.replace(" ", "")
-    if "," in s and "." not in s:
-        s = s.replace(",", ".")
-    return s
+    return s.translate(_PRICE_TAB)
 
 
-def _normalize_row(item: Any) -> Tuple[Optional[Any], Any, Any, Any, Any]:
+def _norm_mapping(item: Mapping) -> Tuple[Optional[Any], Any, Any, Any, Any]:
     """
-    Unifica diferentes formatos de dados de livros (dicionários, tuplas,
-    listas ou objetos) em uma tupla consistente com a estrutura
-    (id, titulo, autor, ano_publicacao, preco).
+    Normaliza um livro em formato de dicionário, traduzindo sinônimos das chaves.
+    Quando as chaves já são as canônicas, elas são lidas diretamente.
     """
-    if isinstance(item, Mapping):
-        d = {mapping.KEY_MAP.get(str(k).lower(), k): v for k, v in item.items()}
-        return (
-            d.get("id"),
-            d.get("titulo"),
-            d.get("autor"),
-            d.get("ano_publicacao"),
-            d.get("preco"),
-        )
+    try:
+        return (item.get("id"),) + _GET_DICT(item)
+    except KeyError:
+        pass
+    d = {mapping.KEY_MAP.get(str(k).lower(), k): v for k, v in item.items()}
+    return (
+        d.get("id"),
+        d.get("titulo"),
+        d.get("autor"),
+        d.get("ano_publicacao"),
+        d.get("preco"),
+    )
+
+
+def _norm_sequence(item: Any) -> Tuple[Optional[Any], Any, Any, Any, Any]:
+    """
+    Normaliza um livro em formato de tupla ou lista. Com 4 itens, assume
+    que falta o id; com menos, completa com `None`.
+    """
+    if len(item) == 5:
+        return tuple(item)
+    if len(item) > 5:
+        return (item[0], item[1], item[2], item[3], item[4])
+    if len(item) == 4:
+        t, a, y, p = item
+        return (None, t, a, y, p)
+    padded = list(item) + [None] * (5 - len(item))
+    return (padded[0], padded[1], padded[2], padded[3], padded[4])
 
-    if isinstance(item, (list, tuple)):
-        if len(item) >= 5:
-            return (item[0], item[1], item[2], item[3], item[4])
-        if len(item) == 4:
-            t, a, y, p = item
-            return (None, t, a, y, p)
-        padded = list(item[:5]) + [None] * max(0, 5 - len(item))
-        return (padded[0], padded[1], padded[2], padded[3], padded[4])
 
+def _norm_object(item: Any) -> Tuple[Optional[Any], Any, Any, Any, Any]:
+    """
+    Normaliza um livro representado por um objeto com atributos.
+    """
+    try:
+        return _GET_OBJ(item)
+    except AttributeError:
+        pass
     return (
         getattr(item, "id", None),
         getattr(item, "titulo", None),
@@ -77,39 +128,36 @@ def _normalize_row(item: Any) -> Tuple[Optional[Any], Any, Any, Any, Any]:
     )
 
 
-def _normalize_books(books: Iterable[Any]) -> List[dict]:
-    """
-    Normaliza uma lista de livros de diferentes formatos em uma lista
-    consistente de dicionários, usando o mapeamento centralizado.
-    """
-    normalized: List[dict] = []
-    for item in books:
-        if isinstance(item, Mapping):
-            out = {}
-            for k, v in dict(item).items():
-                kn = mapping.KEY_MAP.get(str(k).lower(), k)
-                out[kn] = v
-            normalized.append({
-                "id": out.get("id"),
-                "titulo": out.get("titulo"),
-                "autor": out.get("autor"),
-                "ano_publicacao": out.get("ano_publicacao"),
-                "preco": out.get("preco"),
-            })
-        elif isinstance(item, (tuple, list)) and len(item) >= 5:
-            normalized.append({
-                "id": item[0], "titulo": item[1], "autor": item[2],
-                "ano_publicacao": item[3], "preco": item[4],
-            })
-        else:
-            normalized.append({
-                "id": getattr(item, "id", None),
-                "titulo": getattr(item, "titulo", None),
-                "autor": getattr(item, "autor", None),
-                "ano_publicacao": getattr(item, "ano_publicacao", None),
-                "preco": getattr(item, "preco", None),
-            })
-    return normalized
+def _normalize_row(item: Any) -> Tuple[Optional[Any], Any, Any, Any, Any]:
+    """
+    Unifica diferentes formatos de dados de livros (dicionários, tuplas,
+    listas ou objetos) em uma tupla consistente com a estrutura
+    (id, titulo, autor, ano_publicacao, preco).
+    """
+    if isinstance(item, Mapping):
+        return _norm_mapping(item)
+    if isinstance(item, (list, tuple)):
+        return _norm_sequence(item)
+    return _norm_object(item)
+
+
+def _row_normalizer(sample: Any) -> Callable[[Any], Tuple[Optional[Any], Any, Any, Any, Any]]:
+    """
+    Escolhe, a partir de um livro de amostra, a normalização especializada
+    para o tipo dele; itens de outro tipo caem na versão genérica `_normalize_row`.
+    """
+    kind = type(sample)
+    if isinstance(sample, Mapping):
+        fast = _norm_mapping
+    elif isinstance(sample, (list, tuple)):
+        fast = _norm_sequence
+    else:
+        fast = _norm_object
+
+    def normalize(item: Any) -> Tuple[Optional[Any], Any, Any, Any, Any]:
+        return fast(item) if type(item) is kind else _normalize_row(item)
+
+    return normalize
 
 
 def validate_text(label: str, value: Any, *, min_len: int = 1, max_len: int = 200) -> str:
@@ -121,7 +169,7 @@ def validate_text(label: str, value: Any, *, min_len: int = 1, max_len: int = 20
         raise ValidationError(f"{label} não pode ser vazio.")
     if len(s) > max_len:
         raise ValidationError(f"{label} deve ter no máximo {max_len} caracteres.")
-    if not re.search(r"[A-Za-zÀ-ÿ0-9]", s):
+    if not _HAS_ALNUM(s):
         raise ValidationError(f"{label} parece inválido.")
     return s
 
@@ -137,7 +185,7 @@ def validate_year(label: str, value: Any, *, min_year: int = 1400) -> int:
         year = int(s)
     except Exception:
         raise ValidationError(f"{label} deve ser um número inteiro (ex.: 1999).")
-    current_plus_one = datetime.now().year + 1
+    current_plus_one = _current_year_plus_one()
     if year < min_year or year > current_plus_one:
         raise ValidationError(f"{label} deve estar entre {min_year} e {current_plus_one}.")
     return year
@@ -145,18 +193,149 @@ def validate_year(label: str, value: Any, *, min_year: int = 1400) -> int:
 
 def validate_price(label: str, value: Any, *, min_value: float = 0.0, max_value: float = 1_000_000.0) -> float:
     """
-    Valida um valor como um preço.
+    Valida um valor como um preço. Espaços nas pontas são removidos e a
+    vírgula decimal é aceita ("39,90"), então quem chama não precisa tratar o texto.
     """
     s = _coerce_str(value)
     if not s:
         raise ValidationError(f"{label} não pode ser vazio.")
-    s = _normalize_decimal_str(s)
-    try:
-        price = float(s)
-    except Exception:
-        raise ValidationError(f"{label} deve ser um número (ex.: 35.90).")
+    if _PRICE_RE.match(s):
+        price = float(s.translate(_COMMA2DOT))
+    else:
+        s = _normalize_decimal_str(s)
+        try:
+            price = float(s)
+        except Exception:
+            raise ValidationError(f"{label} deve ser um número (ex.: 35.90).")
     if price < min_value:
         raise ValidationError(f"{label} deve ser maior ou igual a {min_value:.2f}.")
     if price > max_value:
         raise ValidationError(f"{label} não pode ser maior que {max_value:.2f}.")
-    return round(price, 2)
\ No newline at end of file
+    return round(price, 2)
+
+
+def validate_positive_int(label: str, value: Any) -> int:
+    """
+    Valida um valor como um inteiro positivo (ex.: o ID de um livro).
+    """
+    s = _coerce_str(value)
+    if not s:
+        raise ValidationError(f"{label} não pode ser vazio.")
+    try:
+        n = int(s)
+    except ValueError:
+        raise ValidationError(f"{label} deve ser um número inteiro.") from None
+    if n <= 0:
+        raise ValidationError(f"{label} deve ser maior que zero.")
+    return n
+
+
+def _validate_row_fast(titulo: Any, autor: Any, ano: Any, preco: Any) -> Optional[Tuple[str, str, int, float]]:
+    """
+    Validação rápida de uma linha de texto (ex.: vinda de um CSV) com as regras
+    padrão de `validate_text`, `validate_year` e `validate_price`, sem chamadas
+    extras nem exceções: retorna a tupla já convertida, ou `None` se algum campo
+    não estiver no formato comum. Nesse caso, os validadores completos devem ser
+    usados para decidir (e explicar o erro); eles nunca rejeitam o que passa aqui.
+    """
+    if type(titulo) is not str or type(autor) is not str or type(ano) is not str or type(preco) is not str:
+        return None
+    titulo, autor, ano, preco = titulo.strip(), autor.strip(), ano.strip(), preco.strip()
+    if not (0 < len(titulo) <= 200 and 0 < len(autor) <= 200 and _HAS_ALNUM(titulo) and _HAS_ALNUM(autor)):
+        return None
+    if not (_YEAR_RE.match(ano) and _PRICE_RE.match(preco)):
+        return None
+    year = int(ano)
+    price = float(preco.translate(_COMMA2DOT))
+    if not (1400 <= year <= _current_year_plus_one() and 0.0 <= price <= 1_000_000.0):
+        return None
+    return titulo, autor, year, round(price, 2)
+
+
+def validate_batch(
+    titulos: Iterable[Any], autores: Iterable[Any], anos: Iterable[Any], precos: Iterable[Any]
+) -> Tuple[List[Tuple[str, str, int, float]], List[Tuple[int, str]]]:
+    """
+    Valida colunas inteiras com `pyarrow.compute`.
+    Uma máscara marca as linhas nos formatos comuns que passam em todas as
+    regras; só as demais passam, uma a uma, pelas funções `validate_*`, que
+    geram as mesmas mensagens de erro da validação linha a linha.
+    Retorna as linhas válidas, na ordem original, e as falhas como (índice, mensagem).
+    O `pyarrow` é importado só aqui, para não pesar na importação do módulo.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+    except ImportError:
+        raise ImportError("Para validar em lote, instale 'pyarrow' (pip install pyarrow).") from None
+
+    def text_array(values):
+        # Coluna (lista ou array do `pyarrow`) como array de texto sem espaços nas pontas.
+        if not isinstance(values, (pa.Array, pa.ChunkedArray)):
+            values = pa.array(values, type=pa.string())
+        elif values.type != pa.string():
+            values = values.cast(pa.string())
+        return pc.utf8_trim_whitespace(values)
+
+    titulo_s, autor_s = text_array(titulos), text_array(autores)
+    ano_s, preco_s = text_array(anos), text_array(precos)
+
+    def text_ok(col):
+        length = pc.utf8_length(col)
+        return pc.and_(
+            pc.and_(pc.greater_equal(length, 1), pc.less_equal(length, 200)),
+            pc.match_substring_regex(col, _ALNUM_PATTERN),
+        )
+
+    ano_fmt = pc.match_substring_regex(ano_s, _YEAR_RE.pattern)
+    ano_v = pc.cast(pc.if_else(ano_fmt, ano_s, "0"), pa.int64())
+    ano_ok = pc.and_(ano_fmt, pc.and_(
+        pc.greater_equal(ano_v, 1400), pc.less_equal(ano_v, _current_year_plus_one())
+    ))
+
+    preco_fmt = pc.match_substring_regex(preco_s, _PRICE_RE.pattern)
+    preco_v = pc.cast(pc.if_else(preco_fmt, pc.replace_substring(preco_s, ",", "."), "0"), pa.float64())
+    preco_ok = pc.and_(preco_fmt, pc.less_equal(preco_v, 1_000_000.0))
+
+    mask = pc.fill_null(
+        pc.and_(pc.and_(text_ok(titulo_s), text_ok(autor_s)), pc.and_(ano_ok, preco_ok)),
+        False,
+    )
+
+    fast = list(zip(
+        pc.filter(titulo_s, mask).to_pylist(),
+        pc.filter(autor_s, mask).to_pylist(),
+        pc.filter(ano_v, mask).to_pylist(),
+        [round(v, 2) for v in pc.filter(preco_v, mask).to_pylist()],
+    ))
+
+    slow_idx = pc.indices_nonzero(pc.invert(mask)).to_pylist()
+    if not slow_idx:
+        return fast, []
+
+    def column(values: Any) -> List[Any]:
+        if isinstance(values, (pa.Array, pa.ChunkedArray)):
+            return values.take(slow_idx).to_pylist()
+        values = list(values)
+        return [values[i] for i in slow_idx]
+
+    recovered: List[Tuple[int, Tuple[str, str, int, float]]] = []
+    failures: List[Tuple[int, str]] = []
+    for i, t, a, y, p in zip(slow_idx, column(titulos), column(autores), column(anos), column(precos)):
+        try:
+            recovered.append((i, (
+                validate_text("Título", t),
+                validate_text("Autor", a),
+                validate_year("Ano", y),
+                validate_price("Preço", p),
+            )))
+        except ValidationError as e:
+            failures.append((i, str(e)))
+
+    if not recovered:
+        return fast, failures
+
+    # Linhas aceitas só pelo caminho lento voltam à sua posição original.
+    fast_idx = pc.indices_nonzero(mask).to_pylist()
+    merged = heapq.merge(zip(fast_idx, fast), recovered, key=lambda item: item[0])
+    return [row for _, row in merged], failures
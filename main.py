@@ -1,11 +1,26 @@
 from __future__ import annotations
+import heapq
+import os
+import sqlite3
+import sys
+from functools import partial
 from pathlib import Path
 from lib.db import DBManager
 from lib.file_manager import FileManager
-from lib.validators import validate_text, validate_year, validate_price, ValidationError
-from lib.utils import input_int, input_nonempty
+from lib.validators import validate_text, validate_year, validate_price, validate_positive_int, ValidationError
+from lib.utils import input_nonempty, input_validated
 from lib.reporting import generate_html_report, generate_pdf_report
 
+# Quantas mensagens de erro da importação são exibidas; das demais linhas
+# inválidas só se mostra o total.
+IMPORT_ERRORS_SHOWN = 10
+
+# Cabeçalho da tabela de livros exibida no terminal.
+BOOKS_HEADER = 'ID   TÍTULO                         AUTOR                  ANO    PREÇO'
+
+# Formato de cada linha da tabela, aplicado com `%` à tupla do banco.
+_ROW_FMT = "%-4s %-30s %-22s %-6s R$   %.2f"
+
 
 class LivrariaCLI:
     """
@@ -38,10 +53,10 @@ class LivrariaCLI:
             titulo = validate_text("Título", titulo_raw)
             autor = validate_text("Autor", autor_raw)
             ano = validate_year("Ano de publicação", ano_raw)
-            preco = validate_price("Preço", str(preco_raw).replace(",", ".").strip())
+            preco = validate_price("Preço", preco_raw)
 
-            # Realiza o backup e a inserção no banco de dados
-            self.file_manager.backup_db()
+            # Realiza o backup (se já for a hora) e a inserção no banco de dados
+            self.file_manager.backup_db_if_due(self.db_manager)
             inserted = self.db_manager.add_book(titulo, autor, ano, preco)
             if inserted:
                 print("✔ Livro adicionado com sucesso!")
@@ -63,11 +78,19 @@ class LivrariaCLI:
         if not rows:
             print("(vazio)")
             return
-        # Imprime o cabeçalho da tabela
-        print('ID   TÍTULO                         AUTOR                  ANO    PREÇO')
-        # Itera sobre os resultados e imprime cada linha formatada
-        for _id, titulo, autor, ano, preco in rows:
-            print(f"{_id:<4} {titulo:<30} {autor:<22} {ano:<6} R$   {preco:>.2f}")
+        self._print_books(rows)
+
+    @staticmethod
+    def _print_books(rows) -> None:
+        """
+        Imprime a tabela de livros (cabeçalho e linhas formatadas) com uma única
+        escrita no terminal, em vez de um `print` por linha.
+        """
+        fmt = _ROW_FMT
+        lines = [fmt % row for row in rows]
+        lines.insert(0, BOOKS_HEADER)
+        lines.append("")
+        sys.stdout.write("\n".join(lines))
 
     def atualizar_preco(self) -> None:
         """
@@ -77,29 +100,26 @@ class LivrariaCLI:
         """
         print("\n=== Atualizar preço de um livro ===")
         try:
-            livro_id = input_int("ID do livro: ")
-            novo_preco_raw = input_nonempty("Novo preço: ")
-            # Valida o novo preço e atualiza o registro
-            novo_preco = validate_price("Preço", str(novo_preco_raw).replace(",", ".").strip())
-            self.file_manager.backup_db()
+            # Cada entrada é pedida de novo até ser válida
+            livro_id = input_validated("ID do livro: ", partial(validate_positive_int, "ID do livro"))
+            novo_preco = input_validated("Novo preço: ", partial(validate_price, "Preço"))
+            self.file_manager.backup_db_if_due(self.db_manager)
             updated_count = self.db_manager.update_price(livro_id, novo_preco)
             if updated_count == 0:
                 print("⚠ ID não encontrado.")
             else:
                 print("✔ Preço atualizado com sucesso!")
-        except ValidationError as e:
-            print(f"⚠ Valor inválido: {e}")
         except Exception as e:
             print(f"⚠ Erro ao atualizar: {e}")
 
     def remover_livro(self) -> None:
         """
         Remove um livro do banco de dados a partir de seu ID.
-        Faz um backup antes de executar a remoção.
+        Faz um backup antes de executar a remoção, no máximo um por minuto.
         """
         print("\n=== Remover um livro ===")
-        livro_id = input_int("ID do livro: ")
-        self.file_manager.backup_db()
+        livro_id = input_validated("ID do livro: ", partial(validate_positive_int, "ID do livro"))
+        self.file_manager.backup_db_if_due(self.db_manager)
         removed_count = self.db_manager.remove_book(livro_id)
         if removed_count == 0:
             print("⚠ ID não encontrado.")
@@ -117,10 +137,7 @@ class LivrariaCLI:
         if not rows:
             print("Nenhum livro encontrado para esse autor.")
             return
-        # Imprime o cabeçalho e os resultados formatados
-        print('ID   TÍTULO                         AUTOR                  ANO    PREÇO')
-        for _id, titulo, autor, ano, preco in rows:
-            print(f"{_id:<4} {titulo:<30} {autor:<22} {ano:<6} R$   {preco:>.2f}")
+        self._print_books(rows)
 
     def exportar_csv(self) -> None:
         """
@@ -128,15 +145,16 @@ class LivrariaCLI:
         Utiliza o `FileManager` para gerenciar a criação do arquivo de exportação.
         """
         print("\n=== Exportar dados para CSV ===")
-        books = self.db_manager.get_all_books()
+        books = self.db_manager.iter_books(readonly=True)
         path = self.file_manager.export_to_csv(books)
         print(f"✔ Exportado para: {path}")
 
     def importar_csv(self) -> None:
         """
         Importa dados de um arquivo CSV para o banco de dados.
-        Lê o arquivo usando `FileManager.get_csv_data` e itera sobre os registros.
-        Para cada registro, extrai os dados, os valida e os adiciona ao banco.
+        Tenta primeiro a importação nativa do SQLite (`DBManager.import_csv_native`);
+        se ela não estiver disponível, usa `FileManager.import_csv`, que lê o arquivo
+        em fluxo, valida cada registro e insere os válidos em blocos, numa única transação.
         Conta os registros inseridos e ignorados e exibe um resumo ao final.
         """
         print("\n=== Importar dados a partir de CSV ===")
@@ -147,33 +165,27 @@ class LivrariaCLI:
         erros = []
 
         try:
-            # Tenta ler o CSV e fazer o backup antes da importação
-            csv_data = self.file_manager.get_csv_data(caminho)
-            self.file_manager.backup_db()
-
-            # Itera sobre cada linha do CSV, valida e insere no banco
-            for i, row in enumerate(csv_data, start=1):
-                try:
-                    # Tenta validar os dados e adicionar o livro
-                    titulo = validate_text("Título", row.get("titulo") or row.get("title", ""))
-                    autor = validate_text("Autor", row.get("autor") or row.get("author", ""))
-                    ano = validate_year("Ano de publicação", row.get("ano_publicacao") or row.get("ano") or row.get("year", ""))
-                    preco = validate_price("Preço", row.get("preco") or row.get("price", ""))
-                    self.db_manager.add_book(titulo, autor, ano, preco)
-                    inseridos += 1
-                except (ValidationError, KeyError) as e:
-                    # Captura erros de validação ou chaves ausentes
-                    ignorados += 1
-                    erros.append(f"Linha {i}: {e}")
+            # Faz o backup antes da importação
+            self.file_manager.backup_db(self.db_manager)
+            try:
+                # Caminho nativo: o próprio SQLite lê, valida e insere o CSV
+                with self.db_manager.fast_ingest():
+                    inseridos, ignorados = self.db_manager.import_csv_native(os.path.expanduser(caminho))
+            except sqlite3.Error:
+                # Sem a extensão `csv` do SQLite, com cabeçalho fora do padrão ou com
+                # alguma linha inválida: lê e valida as linhas em Python, pelo mesmo
+                # caminho de `import_from_csv`, que aponta o erro de cada linha
+                with self.db_manager.fast_ingest():
+                    inseridos, ignorados, erros = self.file_manager.import_csv(self.db_manager, caminho)
 
-            # Exibe o resumo da importação
+            # Exibe o resumo da importação e, ao final, os erros
             print(f"✔ Importação concluída. Inseridos: {inseridos} | Ignorados: {ignorados}")
             if erros:
-                print("— Erros encontrados:")
-                for msg in erros[:10]:
-                    print("  •", msg)
-                if len(erros) > 10:
-                    print(f"  • (+{len(erros)-10} outros)")
+                linhas = ["— Erros encontrados:"]
+                linhas += [f"  • {msg}" for msg in erros[:IMPORT_ERRORS_SHOWN]]
+                if len(erros) > IMPORT_ERRORS_SHOWN:
+                    linhas.append(f"  • (+{len(erros) - IMPORT_ERRORS_SHOWN} outros)")
+                print("\n".join(linhas))
 
         except FileNotFoundError:
             print("⚠ Arquivo não encontrado.")
@@ -185,23 +197,25 @@ class LivrariaCLI:
         Gera um backup manual do banco de dados e exibe o caminho
         do arquivo de backup, junto com uma lista dos backups mais recentes.
         """
-        path = self.file_manager.backup_db()
+        path = self.file_manager.backup_db(self.db_manager)
         print(f"✔ Backup criado: {path.name}")
-        backups = sorted(self.file_manager.backup_dir.glob('backup_livraria_*.db'),
-                         key=lambda p: p.stat().st_mtime, reverse=True)[:5]
+        # O carimbo no nome (AAAA-MM-DD_HHMMSS) tem largura fixa: a ordem dos nomes
+        # é a ordem cronológica.
+        names = [p.name for p in self.file_manager.backup_dir.glob('backup_livraria_*.db')]
         print("Backups recentes:")
-        for b in backups:
-            print(" -", b.name)
+        for name in heapq.nlargest(5, names):
+            print(" -", name)
 
     def gerar_relatorio_html(self) -> None:
         """
         Busca todos os livros e gera um relatório em formato HTML.
         Utiliza a função `generate_html_report` do módulo de relatórios.
         """
-        books = self.db_manager.get_all_books()
+        db = self.db_manager
         out = self.file_manager.exports_dir / "relatorio_livros.html"
         try:
-            path = generate_html_report(books, out)
+            # As linhas vêm do cursor em blocos, sem carregar a tabela inteira.
+            path = generate_html_report(db.iter_books(readonly=True), out, total=db.count_books())
             print(f"✔ Relatório HTML gerado em: {path}")
         except Exception as e:
             print(f"⚠ Erro ao gerar HTML: {e}")
@@ -212,54 +226,65 @@ class LivrariaCLI:
         Utiliza a função `generate_pdf_report` do módulo de relatórios.
         Trata o erro de dependência caso a biblioteca `xhtml2pdf` não esteja instalada.
         """
-        books = self.db_manager.get_all_books()
+        db = self.db_manager
         out = self.file_manager.exports_dir / "relatorio_livros.pdf"
         try:
-            path = generate_pdf_report(books, out)
+            # As linhas vêm do cursor em blocos, sem carregar a tabela inteira.
+            path = generate_pdf_report(db.iter_books(readonly=True), out, total=db.count_books())
             print(f"✔ Relatório PDF gerado em: {path}")
         except ImportError as e:
             print(f"⚠ Não foi possível gerar PDF: {e}\nDica: instale com `pip install xhtml2pdf`.")
         except Exception as e:
             print(f"⚠ Erro ao gerar PDF: {e}")
 
+    # Texto do menu principal.
+    _MENU_TEXT = (
+        "\n=== Sistema de Gerenciamento de Livraria ===\n"
+        "1. Adicionar novo livro\n"
+        "2. Exibir todos os livros\n"
+        "3. Atualizar preço de um livro\n"
+        "4. Remover um livro\n"
+        "5. Buscar livros por autor\n"
+        "6. Exportar dados para CSV\n"
+        "7. Importar dados de CSV\n"
+        "8. Fazer backup do banco de dados\n"
+        "9. Gerar relatório HTML\n"
+        "10. Gerar relatório PDF\n"
+        "11. Sair"
+    )
+
+    # Mapeia as opções do menu para os nomes dos métodos correspondentes. Os
+    # métodos são buscados na instância a cada escolha, então podem ser trocados
+    # depois da criação (por exemplo, em testes).
+    _ACTIONS = {
+        "1": "adicionar_livro",
+        "2": "exibir_livros",
+        "3": "atualizar_preco",
+        "4": "remover_livro",
+        "5": "buscar_por_autor",
+        "6": "exportar_csv",
+        "7": "importar_csv",
+        "8": "fazer_backup_manual",
+        "9": "gerar_relatorio_html",
+        "10": "gerar_relatorio_pdf",
+    }
+
     def menu(self) -> None:
         """
         Exibe o menu principal da aplicação e gerencia as escolhas do usuário
         em um loop contínuo. Chama o método correspondente à opção selecionada.
         """
+        menu_text, actions = self._MENU_TEXT, self._ACTIONS
         while True:
-            # Exibe as opções do menu
-            print("\n=== Sistema de Gerenciamento de Livraria ===")
-            print("1. Adicionar novo livro")
-            print("2. Exibir todos os livros")
-            print("3. Atualizar preço de um livro")
-            print("4. Remover um livro")
-            print("5. Buscar livros por autor")
-            print("6. Exportar dados para CSV")
-            print("7. Importar dados de CSV")
-            print("8. Fazer backup do banco de dados")
-            print("9. Gerar relatório HTML")
-            print("10. Gerar relatório PDF")
-            print("11. Sair")
+            print(menu_text)
             opcao = input("Escolha uma opção: ").strip()
 
-            # Mapeia as opções para os métodos correspondentes
-            actions = {
-                "1": self.adicionar_livro,
-                "2": self.exibir_livros,
-                "3": self.atualizar_preco,
-                "4": self.remover_livro,
-                "5": self.buscar_por_autor,
-                "6": self.exportar_csv,
-                "7": self.importar_csv,
-                "8": self.fazer_backup_manual,
-                "9": self.gerar_relatorio_html,
-                "10": self.gerar_relatorio_pdf,
-            }
-
-            if opcao in actions:
-                actions[opcao]() # Chama o método
+            action = actions.get(opcao)
+            if action is not None:
+                getattr(self, action)() # Chama o método
             elif opcao == "11":
+                # Fecha a conexão persistente com o banco ao sair.
+                self.db_manager.close()
                 print("Até mais!")
                 break
             else:
@@ -1,158 +1,537 @@
+import builtins
+import importlib.util
 import unittest
-from unittest import mock
+from contextlib import contextmanager, nullcontext
 from unittest.mock import Mock, patch, MagicMock
-from io import StringIO
 from pathlib import Path
+import sqlite3
 import sys
+import tempfile
+from datetime import datetime
 
-sys.path.append(str(Path(__file__).resolve().parent))
+# Garante a raiz do projeto no sys.path uma única vez (sem entradas duplicadas).
+ROOT_DIR = str(Path(__file__).resolve().parent)
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
 
+import main
 from main import LivrariaCLI
-from lib.validators import ValidationError
+from lib.db import DBManager
+from lib.file_manager import ARROW_MIN_BYTES, FileManager, import_from_csv
+from lib import reporting
+from lib.reporting import _create_html_rows, generate_html_report, generate_pdf_report
+from lib.validators import ValidationError, validate_batch, validate_price, validate_text, validate_year
+
+# Caminhos fixos usados pelos mocks, criados uma única vez.
+MOCK_DB_PATH = Path("mocked_data/livraria.db")
+MOCK_EXPORTS_DIR = Path("mocked_exports_dir")
+MOCK_EXPORT_CSV = Path("exports/test.csv")
+MOCK_REPORT_HTML = Path("mocked_exports/relatorio.html")
+MOCK_REPORT_PDF = Path("mocked_exports/relatorio.pdf")
+
+
+class ListSink:
+    """
+    Saída falsa para `sys.stdout`: guarda cada trecho escrito numa lista,
+    unida uma única vez na verificação.
+    """
+    def __init__(self):
+        self.parts = []
+
+    def write(self, s):
+        self.parts.append(s)
+        return len(s)
+
+    def flush(self):
+        pass
+
+
+class StubDB:
+    """
+    `DBManager` falso só com valores de retorno fixos, sem registrar chamadas.
+    Usado nos testes que não verificam como o banco foi chamado.
+    """
+    def __init__(self, books=(), changed=1):
+        self.books = list(books)
+        self.changed = changed
+
+    def get_all_books(self):
+        return self.books
+
+    def find_books_by_author(self, termo):
+        return self.books
+
+    def iter_books(self, chunk=1000, *, readonly=False):
+        return iter(self.books)
+
+    def count_books(self):
+        return len(self.books)
+
+    def add_book(self, titulo, autor, ano, preco):
+        return self.changed
+
+    def update_price(self, book_id, new_price):
+        return self.changed
+
+    def remove_book(self, book_id):
+        return self.changed
+
+    def close(self):
+        pass
 
 
 class TestLivrariaCLI(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # Mocks e CLI criados uma única vez; cada teste só os reinicia em `setUp`.
+        # `Mock` basta: só métodos comuns são chamados nos gerenciadores.
+        cls._db_template = Mock(name="DBManager")
+        cls._fm_template = Mock(name="FileManager")
+
+        # Troca direta dos atributos do módulo (mais barata que `patch`),
+        # só durante a criação da CLI.
+        orig_db, orig_fm = main.DBManager, main.FileManager
+        main.DBManager = lambda *a, **k: cls._db_template
+        main.FileManager = lambda *a, **k: cls._fm_template
+        try:
+            cls._cli = LivrariaCLI()
+        finally:
+            main.DBManager, main.FileManager = orig_db, orig_fm
+        cls._cli_state = dict(vars(cls._cli))
+
+    @classmethod
+    def tearDownClass(cls):
+        del cls._cli, cls._cli_state, cls._db_template, cls._fm_template
+
     def setUp(self):
-        self.mock_db_manager = MagicMock(name="DBManager")
-        self.mock_file_manager = MagicMock(name="FileManager")
-        self.mock_file_manager.db_path = Path("mocked_data/livraria.db")
+        self.mock_db_manager = self._db_template
+        self.mock_db_manager.reset_mock(return_value=True, side_effect=True)
+        self.mock_file_manager = self._fm_template
+        self.mock_file_manager.reset_mock(return_value=True, side_effect=True)
+        self.mock_file_manager.db_path = MOCK_DB_PATH
 
         self.mock_file_manager.exports_dir = MagicMock(spec=Path)
-        self.mock_file_manager.exports_dir.__truediv__.side_effect = lambda x: Path(f"mocked_exports_dir/{x}")
+        self.mock_file_manager.exports_dir.__truediv__.side_effect = lambda x: MOCK_EXPORTS_DIR / x
         
-        mock_backup_path = MagicMock(spec=Path)
+        mock_backup_path = Mock(spec=Path)
         mock_backup_path.name = "backup_test.db"
-        mock_stat = MagicMock()
+        mock_stat = Mock()
         mock_stat.st_mtime = 123456789.0
         mock_backup_path.stat.return_value = mock_stat
         self.mock_file_manager.backup_dir.glob.return_value = [mock_backup_path]
 
 
-        self.p_db = patch("main.DBManager", return_value=self.mock_db_manager)
-        self.p_fm = patch("main.FileManager", return_value=self.mock_file_manager)
-        self.p_db.start()
-        self.p_fm.start()
+        # `fast_ingest`/`transaction` são usados em `with`: devolvem um contexto vazio.
+        self.mock_db_manager.fast_ingest.return_value = nullcontext()
+        self.mock_db_manager.transaction.return_value = nullcontext()
 
-        self.cli = LivrariaCLI()
+        # Sem a extensão `csv` do SQLite: a importação cai no caminho em Python.
+        self.mock_db_manager.import_csv_native.side_effect = sqlite3.NotSupportedError
 
-    def tearDown(self):
-        self.p_db.stop()
-        self.p_fm.stop()
+        # Desfaz métodos trocados na instância por testes anteriores.
+        self.cli = self._cli
+        vars(self.cli).clear()
+        vars(self.cli).update(self._cli_state)
 
-    def test_adicionar_livro_success(self):
-        with patch("builtins.input", side_effect=["Titulo Teste", "Autor Teste", "2022", "49.90"]), \
-             patch("builtins.print") as mock_print, \
-             patch("main.validate_text", side_effect=["Titulo Teste", "Autor Teste"]), \
-             patch("main.validate_year", return_value=2022), \
-             patch("main.validate_price", return_value=49.90):
+    @contextmanager
+    def stub_input(self, values):
+        """
+        Substitui `input` por uma função que devolve `values` em ordem,
+        com troca direta do atributo (sem `patch` nem registro de chamadas).
+        """
+        answers = iter(values).__next__
+        old = builtins.input
+        builtins.input = lambda prompt="": answers()
+        try:
+            yield
+        finally:
+            builtins.input = old
+
+    @contextmanager
+    def stub_print(self):
+        """
+        Substitui `print` por uma função que só guarda os argumentos de cada
+        chamada (tuplas) na lista entregue pelo `with`.
+        """
+        calls = []
+        old = builtins.print
+        builtins.print = lambda *args, **kwargs: calls.append(args)
+        try:
+            yield calls
+        finally:
+            builtins.print = old
+
+    def swap_attrs(self, module, **attrs):
+        """
+        Troca atributos de `module` diretamente, restaurando os originais ao
+        fim do teste (`addCleanup`).
+        """
+        for name, value in attrs.items():
+            self.addCleanup(setattr, module, name, getattr(module, name))
+            setattr(module, name, value)
+
+    def assertCalledOnceWith(self, mock_obj, *args):
+        """
+        Verifica uma única chamada com os argumentos posicionais `args`,
+        comparando `call_args.args` diretamente (sem percorrer `mock_calls`).
+        """
+        self.assertEqual(mock_obj.call_count, 1)
+        self.assertEqual(mock_obj.call_args.args, args)
 
-            self.mock_db_manager.add_book.return_value = 1
+    def test_adicionar_livro_success(self):
+        self.swap_attrs(main, validate_text=lambda label, value, **k: value,
+                        validate_year=lambda label, value, **k: 2022,
+                        validate_price=lambda label, value, **k: 49.90)
+        with self.stub_input(["Titulo Teste", "Autor Teste", "2022", "49.90"]), \
+             self.stub_print() as calls:
+            self.cli.db_manager = StubDB()
             self.cli.adicionar_livro()
-            mock_print.assert_any_call("✔ Livro adicionado com sucesso!")
+            self.assertIn(("✔ Livro adicionado com sucesso!",), calls)
 
     def test_adicionar_livro_validation_error(self):
-        with patch("main.input_nonempty", side_effect=ValidationError("Título não pode ser vazio.")), \
-             patch("builtins.print") as mock_print:
+        def input_nonempty(prompt):
+            raise ValidationError("Título não pode ser vazio.")
+
+        self.swap_attrs(main, input_nonempty=input_nonempty)
+        with self.stub_print() as calls:
             self.cli.adicionar_livro()
-            mock_print.assert_any_call("⚠ Dados inválidos: Título não pode ser vazio.")
+            self.assertIn(("⚠ Dados inválidos: Título não pode ser vazio.",), calls)
 
     def test_exibir_livros_empty(self):
-        self.mock_db_manager.get_all_books.return_value = []
-        with patch("builtins.print") as mock_print:
+        self.cli.db_manager = StubDB()
+        with self.stub_print() as calls:
             self.cli.exibir_livros()
-            mock_print.assert_any_call("(vazio)")
+            self.assertIn(("(vazio)",), calls)
 
     def test_exibir_livros_with_data(self):
         mock_books = [(1, "O Pequeno Príncipe", "Antoine de Saint-Exupéry", 1943, 29.90)]
-        self.mock_db_manager.get_all_books.return_value = mock_books
+        self.cli.db_manager = StubDB(mock_books)
 
-        with patch("sys.stdout", new_callable=StringIO) as mock_stdout:
-            self.cli.exibir_livros()
-            output = mock_stdout.getvalue()
-            for value in ["1", "O Pequeno Príncipe", "Antoine de Saint-Exupéry", "1943", "29.90"]:
-                self.assertIn(value, output)
+        sink = ListSink()
+        self.swap_attrs(sys, stdout=sink)
+        self.cli.exibir_livros()
+        output = "".join(sink.parts)
+        for value in ["1", "O Pequeno Príncipe", "Antoine de Saint-Exupéry", "1943", "29.90"]:
+            self.assertIn(value, output)
 
     def test_atualizar_preco_success(self):
-        with patch("builtins.input", side_effect=["1", "55.50"]), \
-             patch("builtins.print") as mock_print, \
-             patch("main.validate_price", return_value=55.5):
-            self.mock_db_manager.update_price.return_value = 1
+        self.swap_attrs(main, validate_price=lambda label, value, **k: 55.5)
+        with self.stub_input(["1", "55.50"]), \
+             self.stub_print() as calls:
+            self.cli.db_manager = StubDB()
             self.cli.atualizar_preco()
-            mock_print.assert_any_call("✔ Preço atualizado com sucesso!")
+            self.assertIn(("✔ Preço atualizado com sucesso!",), calls)
 
     def test_remover_livro_success(self):
-        with patch("builtins.input", side_effect=["1"]), \
-             patch("builtins.print") as mock_print:
-            self.mock_db_manager.remove_book.return_value = 1
+        with self.stub_input(["1"]), \
+             self.stub_print() as calls:
+            self.cli.db_manager = StubDB()
             self.cli.remover_livro()
-            mock_print.assert_any_call("✔ Livro removido com sucesso!")
+            self.assertIn(("✔ Livro removido com sucesso!",), calls)
 
     def test_buscar_por_autor(self):
-        self.mock_db_manager.find_books_by_author.return_value = []
-        with patch("builtins.input", return_value="Autor Teste"), \
-             patch("builtins.print") as mock_print:
+        self.cli.db_manager = StubDB()
+        with self.stub_input(["Autor Teste"]), \
+             self.stub_print() as calls:
             self.cli.buscar_por_autor()
-            mock_print.assert_any_call("Nenhum livro encontrado para esse autor.")
+            self.assertIn(("Nenhum livro encontrado para esse autor.",), calls)
 
     def test_exportar_csv(self):
-        self.mock_db_manager.get_all_books.return_value = []
-        mock_path = Path("exports/test.csv")
+        self.cli.db_manager = StubDB()
+        mock_path = MOCK_EXPORT_CSV
         self.mock_file_manager.export_to_csv.return_value = mock_path
-        with patch("builtins.print") as mock_print:
+        with self.stub_print() as calls:
             self.cli.exportar_csv()
-            mock_print.assert_any_call(f"✔ Exportado para: {mock_path}")
+            self.assertIn((f"✔ Exportado para: {mock_path}",), calls)
 
     def test_importar_csv_success(self):
-        csv_data = [{"titulo": "CSV Book", "autor": "CSV Author", "ano_publicacao": "2023", "preco": "99.99"}]
-        with patch("builtins.input", side_effect=["path/to/mocked.csv"]), \
-             patch("builtins.print") as mock_print:
-            self.mock_file_manager.get_csv_data.return_value = csv_data
-            self.mock_db_manager.add_book.return_value = 1
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "livros.csv"
+            path.write_text("titulo,autor,ano_publicacao,preco\nCSV Book,CSV Author,2023,99.99\n", encoding="utf-8")
+            # O gerenciador falso delega ao mesmo caminho de importação da biblioteca.
+            self.mock_file_manager.import_csv.side_effect = import_from_csv
+            self.mock_db_manager.add_books_bulk.return_value = 1
+            with self.stub_input([str(path)]), \
+                 self.stub_print() as calls:
+                self.cli.importar_csv()
+        self.assertIn(("✔ Importação concluída. Inseridos: 1 | Ignorados: 0",), calls)
+        self.assertCalledOnceWith(self.mock_db_manager.add_books_bulk, [("CSV Book", "CSV Author", 2023, 99.99)])
+
+    def test_importar_csv_limits_errors_shown(self):
+        erros = [f"Linha {i}: Ano não pode ser vazio." for i in range(2, main.IMPORT_ERRORS_SHOWN + 5)]
+        self.mock_file_manager.import_csv.return_value = (0, len(erros), erros)
+        with self.stub_input(["path/to/mocked.csv"]), \
+             self.stub_print() as calls:
             self.cli.importar_csv()
-            mock_print.assert_any_call("✔ Importação concluída. Inseridos: 1 | Ignorados: 0")
+        self.assertIn(("✔ Importação concluída. Inseridos: 0 | Ignorados: 13",), calls)
+        report = calls[-1][0].splitlines()
+        self.assertEqual(report[1], "  • Linha 2: Ano não pode ser vazio.")
+        self.assertEqual(report[-1], "  • (+3 outros)")
+        self.assertEqual(len(report), main.IMPORT_ERRORS_SHOWN + 2)
+
+    def test_importar_csv_native(self):
+        self.mock_db_manager.import_csv_native.side_effect = None
+        self.mock_db_manager.import_csv_native.return_value = (3, 1)
+        with self.stub_input(["path/to/mocked.csv"]), \
+             self.stub_print() as calls:
+            self.cli.importar_csv()
+            self.assertIn(("✔ Importação concluída. Inseridos: 3 | Ignorados: 1",), calls)
+            self.mock_file_manager.import_csv.assert_not_called()
 
     def test_importar_csv_file_not_found(self):
-        self.mock_file_manager.get_csv_data.side_effect = FileNotFoundError("Arquivo não encontrado.")
-        with patch("builtins.input", side_effect=["non_existent.csv"]), \
-             patch("builtins.print") as mock_print:
+        self.mock_file_manager.import_csv.side_effect = FileNotFoundError("Arquivo não encontrado.")
+        with self.stub_input(["non_existent.csv"]), \
+             self.stub_print() as calls:
             self.cli.importar_csv()
-            mock_print.assert_any_call("⚠ Arquivo não encontrado.")
+            self.assertIn(("⚠ Arquivo não encontrado.",), calls)
 
     def test_fazer_backup_manual(self):
-        mock_path = MagicMock()
+        mock_path = Mock()
         mock_path.name = "backup_test.db"
         self.mock_file_manager.backup_db.return_value = mock_path
         
-        with patch("builtins.print") as mock_print:
+        with self.stub_print() as calls:
             self.cli.fazer_backup_manual()
-            mock_print.assert_any_call("✔ Backup criado: backup_test.db")
-            mock_print.assert_any_call(" -", "backup_test.db")
+            self.assertIn(("✔ Backup criado: backup_test.db",), calls)
+            self.assertIn((" -", "backup_test.db"), calls)
 
     def test_gerar_relatorio_html(self):
-        with patch('main.generate_html_report', return_value=Path("mocked_exports/relatorio.html")) as mock_gerador_html, \
-            patch('builtins.print') as mock_print:
+        with patch('main.generate_html_report', return_value=MOCK_REPORT_HTML) as mock_gerador_html, \
+            self.stub_print() as calls:
             self.cli.gerar_relatorio_html()
-            mock_gerador_html.assert_called_once()
-            mock_print.assert_any_call(mock.ANY)
+            self.assertEqual(mock_gerador_html.call_count, 1)
+            self.assertTrue(calls)
 
     def test_gerar_relatorio_pdf(self):
-        with patch('main.generate_pdf_report', return_value=Path("mocked_exports/relatorio.pdf")) as mock_gerador_pdf, \
-            patch('builtins.print') as mock_print:
+        with patch('main.generate_pdf_report', return_value=MOCK_REPORT_PDF) as mock_gerador_pdf, \
+            self.stub_print() as calls:
             self.cli.gerar_relatorio_pdf()
-            mock_gerador_pdf.assert_called_once()
-            mock_print.assert_any_call(mock.ANY)
+            self.assertEqual(mock_gerador_pdf.call_count, 1)
+            self.assertTrue(calls)
 
     def test_menu_options_flow(self):
-        self.cli.gerar_relatorio_html = MagicMock()
-        self.cli.gerar_relatorio_pdf = MagicMock()
-        self.cli.adicionar_livro = MagicMock()
-
-        with patch("builtins.input", side_effect=["1", "11"]):
-            self.cli.menu()
-            self.cli.adicionar_livro.assert_called_once()
-
-        with patch("builtins.input", side_effect=["99", "11"]), \
-             patch("sys.stdout", new_callable=StringIO) as mock_stdout:
-            self.cli.menu()
-            output = mock_stdout.getvalue()
-            self.assertIn("Opção inválida. Tente novamente.", output)
\ No newline at end of file
+        self.cli.gerar_relatorio_html = Mock()
+        self.cli.gerar_relatorio_pdf = Mock()
+        self.cli.adicionar_livro = Mock()
+
+        # Uma única troca de `input` alimenta as três passagens pelo menu (cada
+        # uma termina em "11"); as verificações vêm depois de todas.
+        with self.stub_input(["1", "11", "99", "11", "9", "10", "11"]), \
+             self.stub_print() as calls:
+            for _ in range(3):
+                self.cli.menu()
+
+        self.assertEqual(self.cli.adicionar_livro.call_count, 1)
+        self.assertIn(("Opção inválida. Tente novamente.",), calls)
+        self.assertEqual(self.cli.gerar_relatorio_html.call_count, 1)
+        self.assertEqual(self.cli.gerar_relatorio_pdf.call_count, 1)
+        self.assertEqual(calls.count(("Até mais!",)), 3)
+
+
+class TestExportToCsv(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.fm = FileManager(Path(self.tmp.name))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_db_tuples_match_normalized_path(self):
+        books = [(1, "Dom Casmurro", "Machado de Assis", 1899, 39.9),
+                 (2, "O Alquimista", "Paulo Coelho", 1988, 29.9)]
+        # Dicionários com as mesmas informações passam pelo caminho normalizado.
+        as_dicts = [dict(zip(("id", "titulo", "autor", "ano_publicacao", "preco"), b)) for b in books]
+
+        fast = self.fm.export_to_csv(books, "fast.csv").read_text(encoding="utf-8")
+        normalized = self.fm.export_to_csv(as_dicts, "normalized.csv").read_text(encoding="utf-8")
+        self.assertEqual(fast, normalized)
+        self.assertTrue(fast.startswith("id,titulo,autor,ano_publicacao,preco"))
+
+    def test_db_tuples_followed_by_other_formats(self):
+        books = [(i, f"Livro {i}", "Autor", 2000, 10.0) for i in range(1, 1001)]
+        books.append({"id": 1001, "titulo": "Dict", "autor": "Autor", "ano_publicacao": 2001, "preco": 5.5})
+        text = self.fm.export_to_csv(books, "mixed.csv").read_text(encoding="utf-8")
+        lines = text.splitlines()
+        self.assertEqual(len(lines), 1002)
+        self.assertEqual(lines[-1], "1001,Dict,Autor,2001,5.5")
+
+    def test_id_after_first_chunk_keeps_id_column(self):
+        books = [("Livro", "Autor", 2000, 10.0)] * 1000
+        books.append({"id": 7, "titulo": "Com id", "autor": "Autor", "ano_publicacao": 2001, "preco": 5.5})
+        lines = self.fm.export_to_csv(books, "ids.csv").read_text(encoding="utf-8").splitlines()
+        self.assertEqual(lines[0], "id,titulo,autor,ano_publicacao,preco")
+        self.assertEqual(lines[1], ",Livro,Autor,2000,10.0")
+        self.assertEqual(lines[-1], "7,Com id,Autor,2001,5.5")
+
+    def test_recreates_deleted_exports_dir(self):
+        self.fm.exports_dir.rmdir()
+        path = self.fm.export_to_csv([(1, "Dom Casmurro", "Machado de Assis", 1899, 39.9)], "r.csv")
+        self.assertTrue(path.exists())
+
+
+class TestBackup(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.fm = FileManager(Path(self.tmp.name))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_backup_db_if_due_throttles(self):
+        first = self.fm.backup_db_if_due()
+        self.assertIsNotNone(first)
+        self.assertIsNone(self.fm.backup_db_if_due())
+        self.assertIsNotNone(self.fm.backup_db_if_due(min_interval_s=0))
+
+
+class TestImportFromCsv(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.db = DBManager(":memory:")
+        self.addCleanup(self.db.close)
+
+    def write_large_csv(self, extra_lines):
+        """
+        Grava um CSV maior que `ARROW_MIN_BYTES` (caminho do pyarrow, se instalado)
+        com `extra_lines` no meio; retorna o caminho e o total de linhas válidas.
+        """
+        path = Path(self.tmp.name) / "grande.csv"
+        line = "Livro {i},Autor {i},2000,10.50\n"
+        n = ARROW_MIN_BYTES // len(line.format(i=0)) + 1
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            f.write("titulo,autor,ano_publicacao,preco\n")
+            f.writelines(line.format(i=i) for i in range(n // 2))
+            f.writelines(extra_lines)
+            f.writelines(line.format(i=i) for i in range(n // 2, n))
+        return str(path), n
+
+    def test_large_file_with_short_row_reports_line_error(self):
+        path, n = self.write_large_csv(["Curto,Autor\n"])
+        inserted, ignored, errors = import_from_csv(self.db, path)
+        self.assertEqual(inserted, n)
+        self.assertEqual(ignored, 1)
+        self.assertEqual(errors, [f"Linha {n // 2 + 2}: Ano não pode ser vazio."])
+
+    def test_large_file_with_newline_inside_quotes(self):
+        path, n = self.write_large_csv(['"Duas\nLinhas",Autor,2001,5\n'])
+        inserted, ignored, errors = import_from_csv(self.db, path)
+        self.assertEqual((inserted, ignored, errors), (n + 1, 0, []))
+        self.assertTrue(any(b[1] == "Duas\nLinhas" for b in self.db.get_all_books()))
+
+    def test_missing_file(self):
+        path = str(Path(self.tmp.name) / "nao_existe.csv")
+        inserted, ignored, errors = import_from_csv(self.db, path)
+        self.assertEqual((inserted, ignored), (0, 0))
+        self.assertTrue(errors[0].startswith("Arquivo não encontrado: "))
+        # Na CLI, `FileManager.import_csv` deixa o erro subir para a mensagem do menu.
+        with self.assertRaises(FileNotFoundError):
+            FileManager(Path(self.tmp.name)).import_csv(self.db, path)
+
+
+@unittest.skipUnless(importlib.util.find_spec("pyarrow"), "pyarrow não instalado")
+class TestValidateBatch(unittest.TestCase):
+    def test_valid_columns(self):
+        rows, failures = validate_batch(["A", " B "], ["x", "y"], ["2000", "1999"], ["10,5", "7"])
+        self.assertEqual(rows, [("A", "x", 2000, 10.5), ("B", "y", 1999, 7.0)])
+        self.assertEqual(failures, [])
+
+    def test_invalid_columns(self):
+        rows, failures = validate_batch(
+            ["A", "", "C", "D", "E"], ["x", "y", "z", "w", "v"],
+            ["2000", "2001", "abc", "1999", "1300"], ["10", "5", "3", "1 000,50", "2"],
+        )
+        # "1 000,50" não está no formato comum, mas é aceito pela validação completa.
+        self.assertEqual(rows, [("A", "x", 2000, 10.0), ("D", "w", 1999, 1000.5)])
+        self.assertEqual([i for i, _ in failures], [1, 2, 4])
+        self.assertEqual(failures[0][1], "Título não pode ser vazio.")
+        self.assertTrue(failures[2][1].startswith("Ano deve estar entre 1400 e "))
+
+
+class TestFindBooksByAuthor(unittest.TestCase):
+    def test_substring_search_matches_like(self):
+        db = DBManager(":memory:")
+        self.addCleanup(db.close)
+        db.add_books_bulk([("A", "Machado de Assis", 1899, 10.0), ("B", "José Saramago", 1995, 20.0)])
+        db.add_book("C", "Assis Brasil", 2001, 30.0)
+        self.assertEqual([r[0] for r in db.find_books_by_author("assis")], [1, 3])
+        self.assertEqual([r[0] for r in db.find_books_by_author("sé")], [2])
+        db.remove_book(1)
+        self.assertEqual([r[0] for r in db.find_books_by_author("ASSIS")], [3])
+
+
+class TestImportCsvNative(unittest.TestCase):
+    def test_sql_filter_matches_validators(self):
+        # Tabela comum no lugar da virtual: as mesmas consultas, sem a extensão.
+        db = DBManager(":memory:")
+        self.addCleanup(db.close)
+        rows = [("\tDom Casmurro ", " Machado\n", " 1899", "39,90"),
+                ("O Alquimista", "Paulo Coelho", "1988\r", " 1 000,5 "),
+                ("Livro", "Autor", "2000", "10."),
+                ("Caro", "Autor", "2001", "2.675")]
+        db._conn.execute("CREATE TABLE temp.livros_csv (titulo, autor, ano_publicacao, preco)")
+        db._conn.executemany("INSERT INTO temp.livros_csv VALUES (?, ?, ?, ?)", rows)
+        year = datetime.now().year + 1
+
+        total, valid = db._conn.execute(DBManager._SQL_CSV_VTAB_COUNT, (year,)).fetchone()
+        self.assertEqual((total, valid), (4, 3))  # 3 casas decimais ficam para o Python
+        db._conn.execute(DBManager._SQL_IMPORT_FROM_CSV_VTAB, (year,))
+
+        expected = [(validate_text("Título", t), validate_text("Autor", a),
+                     validate_year("Ano", y), validate_price("Preço", p)) for t, a, y, p in rows[:3]]
+        self.assertEqual([r[1:] for r in db.get_all_books()], expected)
+
+    def test_requires_absolute_extension_path(self):
+        db = DBManager(":memory:")
+        self.addCleanup(db.close)
+        for extension in (None, "csv"):
+            with self.assertRaises(sqlite3.NotSupportedError):
+                db.import_csv_native("livros.csv", extension)
+        self.assertEqual(db.count_books(), 0)
+
+
+class TestReporting(unittest.TestCase):
+    def test_html_rows_escape_text_cells(self):
+        html = _create_html_rows([(1, "Tom & Jerry <b>", 'O "Autor"', 2001, 10.5)])
+        self.assertIn("<td>Tom &amp; Jerry &lt;b&gt;</td>", html)
+        self.assertIn("<td>O &quot;Autor&quot;</td>", html)
+        self.assertIn("<td>10,50</td>", html)
+
+    def test_html_rows_price_matches_format(self):
+        for preco in (0.005, 2.675, 39.9, 10, 1234.5):
+            html = _create_html_rows([(1, "T", "A", 2000, preco)])
+            self.assertIn(f"<td>{format(preco, '.2f').replace('.', ',')}</td>", html)
+
+    def test_html_report_accepts_generator(self):
+        books = [(1, "Dom Casmurro", "Machado de Assis", 1899, 39.9),
+                 (2, "O Alquimista", "Paulo Coelho", 1988, 29.9)]
+        with tempfile.TemporaryDirectory() as tmp:
+            path = generate_html_report((b for b in books), Path(tmp) / "r.html")
+            html = Path(path).read_text(encoding="utf-8")
+        self.assertIn('Total: <span class="badge">2</span>', html)
+        self.assertEqual(html.count("<tr><td>"), 2)
+
+    def test_html_report_recreates_deleted_dir(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            out = Path(tmp) / "sub" / "r.html"
+            generate_html_report([], out)
+            out.unlink()
+            out.parent.rmdir()
+            generate_html_report([], out)
+            self.assertTrue(out.exists())
+
+    def test_pdf_report_writes_only_the_pdf(self):
+        rendered = []
+        # Renderizador falso: guarda o HTML recebido e grava um PDF vazio.
+        def render(html, outfile):
+            rendered.append(html)
+            outfile.write_bytes(b"%PDF")
+        self.addCleanup(setattr, reporting, "_pdf_renderer", reporting._pdf_renderer)
+        reporting._pdf_renderer = render
+
+        with tempfile.TemporaryDirectory() as tmp:
+            out = Path(tmp) / "sub" / "r.pdf"
+            path = generate_pdf_report([(1, "Dom Casmurro", "Machado de Assis", 1899, 39.9)], out)
+            self.assertEqual(path, str(out.resolve()))
+            self.assertEqual(sorted(p.name for p in out.parent.iterdir()), ["r.pdf"])
+        self.assertIn('Total: <span class="badge">1</span>', rendered[0])